@@ -2,19 +2,18 @@ from collections import defaultdict
 from itertools import chain
 from enum import Enum
 
-from core.simulator import JIT, iter_simulation_topology
 from PySide6.QtWidgets import *
 from PySide6.QtCore import *
 from PySide6.QtGui import *
 from diagram import DIRS, Schematic, Element
-from core.descriptors import ExposedPin, Gate, Not, Composite
+from core.descriptors import ExposedPin, Gate, Not, Composite, flyweight
 from editors import *
 
 import networkx as nx
 
 from version import format_version
 
-import pickle
+import serial
 
 
 class Mode(Enum):
@@ -39,6 +38,7 @@ class DiagramEditor(QWidget):
         self.executor = None
 
         self._grid = self._make_grid()
+        self._wire_cache = None
 
         self._translation = QPoint()
 
@@ -65,12 +65,35 @@ class DiagramEditor(QWidget):
 
         def do_stuff():
             self.executor.step()
-            self.update()
+            self.update_changed()
 
         self.redraw_timer.timeout.connect(do_stuff)
 
         self.setMouseTracking(True)
 
+    @property
+    def executor(self):
+        return self._executor
+
+    @executor.setter
+    def executor(self, executor):
+        self._executor = executor
+        self._change_token = None
+
+    def update_changed(self):
+        try:
+            self._change_token, changed = self.executor.changed_since(
+                self._change_token)
+        except NotImplementedError:
+            self.update()
+            return
+
+        trans = self._current_translation()
+        for element in self.schematic.elements:
+            if not changed.isdisjoint(self._element_pins(element)):
+                self.update(self._element_rect(
+                    element, element.position).translated(trans))
+
     def toggle_interaction_mode(self):
         self._mode = Mode.EDIT if self._mode == Mode.VIEW else Mode.VIEW
         self._state = EditState.NONE if self._mode == Mode.EDIT else ViewState.NONE
@@ -327,6 +350,41 @@ class DiagramEditor(QWidget):
 
         return pixmap
 
+    def _pin_path(self, element: Element, name):
+        if isinstance(element.descriptor, Composite):
+            return '/' + element.name + '/' + name + '/pin'
+        return '/' + element.name + '/' + name
+
+    def _element_pins(self, element: Element):
+        return list(map(lambda p: self._pin_path(element, p[1]),
+                        chain(element.all_inputs(), element.all_outputs())))
+
+    def _element_rect(self, element: Element, position):
+        gs = self.grid_size
+        bb = element.get_bounding_rect()
+        r = QRect(bb.x() * gs, bb.y() * gs, bb.width() * gs, bb.height() * gs)
+        r = r.united(self.fontMetrics().boundingRect(element.name).translated(
+            bb.topLeft() * gs))
+        transform = QTransform().translate(position.x() * gs, position.y() * gs)
+        transform.rotate(element.facing * -90)
+        return transform.mapRect(r).marginsAdded(QMargins(*(gs,) * 4))
+
+    def _wire_lines(self):
+        geometry = self.schematic.wire_geometry()
+        if self._wire_cache is None or self._wire_cache[0] is not geometry:
+            gs = self.grid_size
+            lines, junctions = geometry
+            self._wire_cache = (
+                geometry,
+                list(map(lambda line: QLine(line.p1() * gs, line.p2() * gs), lines)),
+                list(map(lambda p: p * gs, junctions)))
+        return self._wire_cache[1:]
+
+    def _current_translation(self):
+        if self._mode == Mode.VIEW and self._state == ViewState.MOVE:
+            return self._translation + self._end - self._start
+        return self._translation
+
     def paint_element(self, painter: QPainter, element: Element, position, ghost, selected):
         gs = self.grid_size
         facing = element.facing
@@ -462,11 +520,8 @@ class DiagramEditor(QWidget):
                                    element.all_outputs()):
                 state = -1
                 if self.executor is not None:
-                    if isinstance(element.descriptor, Composite):
-                        path = '/' + element.name + '/' + name + '/pin'
-                    else:
-                        path = '/' + element.name + '/' + name
-                    state = self.executor.get_pin_state(path)
+                    state = self.executor.get_pin_state(
+                        self._pin_path(element, name))
                 if state == -1:
                     painter.setPen(QPen(Qt.blue, 6.0))
                 elif state == 0:
@@ -489,10 +544,7 @@ class DiagramEditor(QWidget):
         wire_col = tex_col
         cur_col = tex_col
 
-        if self._mode == Mode.VIEW and self._state == ViewState.MOVE:
-            trans = self._translation + self._end - self._start
-        else:
-            trans = self._translation
+        trans = self._current_translation()
 
         gs = self.grid_size
 
@@ -505,10 +557,15 @@ class DiagramEditor(QWidget):
 
         painter.translate(trans)
 
+        region = event.rect().translated(-trans)
+
         for element in self.schematic.elements:
             if self._state == EditState.DRAG and self._selected_element is element:
                 continue
 
+            if not self._element_rect(element, element.position).intersects(region):
+                continue
+
             selected = self._state == EditState.SELECT and self._selected_element is element
 
             self.paint_element(
@@ -527,28 +584,17 @@ class DiagramEditor(QWidget):
             self.paint_element(
                 painter, element, p, True, False)
 
-        wires = list()
+        wires, junctions = self._wire_lines()
 
         if self._state == EditState.WIRE:
             curr_wires = self._get_wire()
             if curr_wires is not None:
-                self.schematic.construct_wires(curr_wires)
-
-        wiremap = self.schematic.wires
+                wires = wires + list(map(
+                    lambda w: QLine(QPoint(*w[:2]) * gs, QPoint(*w[2:]) * gs),
+                    curr_wires))
 
         painter.setPen(QPen(wire_col, 4.0))
-
-        for node in wiremap.nodes:
-            if self.schematic.all_connected(node):
-                painter.drawPoint(node * gs)
-                cc = False
-            else:
-                cc = self.schematic.cross_connected(node)
-            for d in DIRS:
-                if wiremap.has_edge(node, node + d) or cc:
-                    p1 = QPoint(node) * gs
-                    p2 = QPoint(node + d) * gs
-                    wires.append(QLine(p1, p2))
+        painter.drawPoints(junctions)
 
         painter.setPen(QPen(wire_col, 2.0))
         painter.drawLines(wires)
@@ -566,7 +612,7 @@ def element_factory(cls, name, *args, **kwargs):
         nonlocal counter
         counter += 1
         elem_name = name + '_' + str(counter)
-        element = Element(elem_name, cls(*args, **kwargs))
+        element = Element(elem_name, flyweight(cls(*args, **kwargs)))
         return element
 
     return wrapper
@@ -606,25 +652,39 @@ class MainWindow(QMainWindow):
         file_menu = QMenu('File')
         file_menu.addAction('New')
 
+        project = None
+
+        def load_diagram(d):
+            if project is not None:
+                project.load(d)
+            return d
+
         def open_project():
-            nonlocal diagrams, diagram_count
+            nonlocal diagrams, diagram_count, project
             diag.schematic = Schematic('')
             diagram_tree.clear()
             f = QFileDialog.getOpenFileName(self, 'Open Project')[0]
-            with open(f, 'rb') as file:
-                diagrams = pickle.load(file)
-                for d in diagrams:
-                    diagram_count += 1
-                    it = QListWidgetItem(d.name)
-                    it.setData(Qt.UserRole, d)
-                    diagram_tree.addItem(it)
-                    if d.name == 'main':
-                        diag.schematic = d
+            if project is not None:
+                project.close()
+            project = serial.open_project(f)
+            diagrams = project.diagrams
+            for d in diagrams:
+                diagram_count += 1
+                it = QListWidgetItem(d.name)
+                it.setData(Qt.UserRole, d)
+                diagram_tree.addItem(it)
+                if d.name == 'main':
+                    diag.schematic = load_diagram(d)
 
         def save_project():
+            nonlocal project
             f = QFileDialog.getSaveFileName(self, 'Save Project')[0]
+            if project is not None:
+                project.load_all()
+                project.close()
+                project = None
             with open(f, 'wb') as file:
-                pickle.dump(diagrams, file)
+                serial.save_project(file, diagrams)
 
         file_menu.addAction('Open...', open_project)
         file_menu.addSeparator()
@@ -657,14 +717,14 @@ class MainWindow(QMainWindow):
         diagram_tree = QListWidget()
 
         def change_diagram(item):
-            diag.schematic = item.data(Qt.UserRole)
+            diag.schematic = load_diagram(item.data(Qt.UserRole))
             diag.stop_placing()
 
         counter = defaultdict(int)
 
         def add_custom_element(item):
             nonlocal counter
-            diagram = item.data(Qt.UserRole)
+            diagram = load_diagram(item.data(Qt.UserRole))
             base_name = item.text()
             counter[base_name] += 1
             composite = diagram.composite
@@ -713,6 +773,11 @@ class MainWindow(QMainWindow):
         toolbar.setMovable(False)
         simulate_btn = QPushButton('Start')
         toolbar.addWidget(simulate_btn)
+        reset_btn = QPushButton('Reset')
+        reset_btn.setEnabled(False)
+        toolbar.addWidget(reset_btn)
+        attach_btn = QPushButton('Attach')
+        toolbar.addWidget(attach_btn)
         self.addToolBar(toolbar)
 
         view_menu = self.createPopupMenu()
@@ -723,18 +788,42 @@ class MainWindow(QMainWindow):
             executing = diag.executor is not None
             if executing:
                 simulate_btn.setText('Start')
+                reset_btn.setEnabled(False)
+                attach_btn.setEnabled(True)
+                diag.executor.close()
                 diag.executor = None
                 diag.redraw_timer.stop()
             else:
                 simulate_btn.setText('Stop')
+                reset_btn.setEnabled(True)
+                attach_btn.setEnabled(False)
                 diag.schematic.reconstruct()
                 s = diag.schematic.composite
+                from core.simulator import JIT
                 exe = JIT(s, 500, True)
                 diag.executor = exe
                 diag.redraw_timer.start()
             diag.update()
 
+        def reset_simulation():
+            if diag.executor is not None:
+                diag.executor.reset()
+            diag.update()
+
+        def attach_simulation():
+            name, ok = QInputDialog.getText(self, 'Attach', 'Shared state name')
+            if not ok or not name:
+                return
+            from core.shared import StateViewer
+            diag.executor = StateViewer(name)
+            simulate_btn.setText('Stop')
+            attach_btn.setEnabled(False)
+            diag.redraw_timer.start()
+            diag.update()
+
         simulate_btn.clicked.connect(toggle_simulation)
+        attach_btn.clicked.connect(attach_simulation)
+        reset_btn.clicked.connect(reset_simulation)
 
         d = Schematic('main')
         diagrams.append(d)
@@ -747,8 +836,14 @@ class MainWindow(QMainWindow):
             if element is None:
                 element_editor_dock.setWidget(None)
             else:
+                schematic = diag.schematic
+
+                def on_edited():
+                    schematic.reconstruct()
+                    diag.update()
+
                 ed = ElementPropertyEditor(element)
-                ed.edited.connect(diag.update)
+                ed.edited.connect(on_edited)
                 element_editor_dock.setWidget(ed)
                 ed.show()
 
@@ -0,0 +1,86 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .simulator import Executor
+
+
+def _step_loop(executor: Executor, cycles):
+    for _ in range(cycles):
+        executor.step()
+
+
+class AsyncExecutor:
+    def __init__(self, executor: Executor, chunk_size=100000):
+        self.executor = executor
+        self.chunk_size = chunk_size
+
+        if type(executor).run is Executor.run:
+            self._run = lambda cycles: _step_loop(executor, cycles)
+        else:
+            self._run = executor.run
+
+        self._pool = ThreadPoolExecutor(1)
+        self._lock = asyncio.Lock()
+        self._watchers = list()
+
+    @property
+    def cycle(self):
+        return self.executor.cycle
+
+    def get_pin_state(self, pin):
+        return self.executor.get_pin_state(pin)
+
+    async def set_pin_state(self, pin, value):
+        async with self._lock:
+            self.executor.set_pin_state(pin, value)
+            self._poll_watchers()
+
+    async def _run_chunk(self, cycles):
+        async with self._lock:
+            await asyncio.get_running_loop().run_in_executor(
+                self._pool, self._run, cycles)
+            self._poll_watchers()
+
+    async def run_for(self, cycles):
+        while cycles > 0:
+            n = min(cycles, self.chunk_size)
+            await self._run_chunk(n)
+            cycles -= n
+        return self.cycle
+
+    async def until(self, condition, max_cycles=None, check_every=None):
+        if check_every is None:
+            check_every = self.chunk_size
+        start = self.cycle
+
+        while not condition(self.executor):
+            n = check_every
+            if max_cycles is not None:
+                n = min(n, start + max_cycles - self.cycle)
+                if n <= 0:
+                    raise TimeoutError(
+                        f'condition not met within {max_cycles} cycles')
+            await self._run_chunk(n)
+
+        return self.cycle
+
+    def _poll_watchers(self):
+        for watcher in self._watchers:
+            pin, last, queue = watcher
+            value = self.executor.get_pin_state(pin)
+            if value != last:
+                watcher[1] = value
+                queue.put_nowait((self.cycle, value))
+
+    async def watch(self, pin):
+        queue = asyncio.Queue()
+        watcher = [pin, self.executor.get_pin_state(pin), queue]
+        self._watchers.append(watcher)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._watchers.remove(watcher)
+
+    def close(self):
+        self._pool.shutdown()
@@ -0,0 +1,49 @@
+import mmap
+import struct
+from ctypes import c_char
+
+from .simulator import CompiledExecutor
+
+
+MAGIC = b'MCCK'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sH64sQ')
+_DATA_OFFSET = 128
+
+
+def save_checkpoint(executor: CompiledExecutor, path):
+    size = executor.layout.size
+
+    with open(path, 'w+b') as f:
+        f.truncate(_DATA_OFFSET + size)
+        with mmap.mmap(f.fileno(), _DATA_OFFSET + size) as m:
+            _HEADER.pack_into(m, 0, MAGIC, VERSION,
+                              executor.circuit_hash.encode(), size)
+            m[_DATA_OFFSET:] = memoryview(executor.state).cast('B')
+
+
+def read_checkpoint(path):
+    with open(path, 'rb') as f:
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    magic, version, circuit_hash, size = _HEADER.unpack_from(m)
+    if magic != MAGIC:
+        m.close()
+        raise ValueError('not a simulation checkpoint')
+    if version > VERSION:
+        m.close()
+        raise ValueError(f'unsupported checkpoint version {version}')
+
+    return circuit_hash.decode(), m, size
+
+
+def load_checkpoint(executor: CompiledExecutor, path):
+    circuit_hash, m, size = read_checkpoint(path)
+
+    try:
+        if circuit_hash != executor.circuit_hash:
+            raise ValueError('checkpoint was taken from a different circuit')
+        executor.restore((c_char * size).from_buffer(m, _DATA_OFFSET))
+    finally:
+        m.close()
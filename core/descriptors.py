@@ -1,12 +1,47 @@
 from copy import deepcopy
+from hashlib import blake2b
+from operator import attrgetter
+from weakref import WeakValueDictionary
 
 import networkx as nx
 
 
+def _params_getter(slots):
+    if len(slots) == 1:
+        get = attrgetter(*slots)
+        return lambda desc: (get(desc),)
+    return attrgetter(*slots)
+
+
 class Descriptor:
+    __slots__ = ('__weakref__',)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._params = staticmethod(_params_getter(cls.__slots__))
+
     def clone(self):
         return deepcopy(self)
 
+    def params(self):
+        return self._params(self)
+
+    def replace(self, **changes):
+        tp = type(self)
+        params = tuple(map(changes.get, tp.__slots__, self._params(self)))
+        shared = _FLYWEIGHTS.get((tp, params))
+        if shared is not None:
+            return shared
+        desc = tp.__new__(tp)
+        for attribute, value in zip(tp.__slots__, params):
+            setattr(desc, attribute, value)
+        return flyweight(desc)
+
+    def structural_hash(self, memo=None):
+        h = blake2b(digest_size=16)
+        h.update(repr((type(self).__name__, self.params())).encode())
+        return h.digest()
+
     def all_inputs(self):
         yield from []
 
@@ -16,6 +51,9 @@ class Descriptor:
     def all_internals(self):
         yield from []
 
+    def all_memories(self):
+        yield from []
+
     def all_pins(self):
         yield from self.all_inputs()
         yield from self.all_outputs()
@@ -24,6 +62,7 @@ class Descriptor:
 
 class ExposedPin(Descriptor):
     IN, OUT = range(2)
+    __slots__ = ('direction', 'width')
 
     def __init__(self, direction, width=1):
         super().__init__()
@@ -40,6 +79,8 @@ class ExposedPin(Descriptor):
 
 
 class Constant(Descriptor):
+    __slots__ = ('width', 'value')
+
     def __init__(self, width=1, value=0):
         super().__init__()
         self.width = width
@@ -50,6 +91,8 @@ class Constant(Descriptor):
 
 
 class Not(Descriptor):
+    __slots__ = ('width',)
+
     def __init__(self, width=1):
         super().__init__()
         self.width = width
@@ -63,6 +106,7 @@ class Not(Descriptor):
 
 class Gate(Descriptor):
     AND, OR, XOR = range(3)
+    __slots__ = ('op', 'width', 'num_inputs', 'negated')
 
     def __init__(self, op, width=1, num_inputs=2, negated=False):
         super().__init__()
@@ -79,6 +123,8 @@ class Gate(Descriptor):
 
 
 class Register(Descriptor):
+    __slots__ = ('width',)
+
     def __init__(self, width=1):
         super().__init__()
         self.width = width
@@ -95,6 +141,8 @@ class Register(Descriptor):
 
 
 class Counter(Descriptor):
+    __slots__ = ('width',)
+
     def __init__(self, width=1):
         super().__init__()
         self.width = width
@@ -110,6 +158,8 @@ class Counter(Descriptor):
 
 
 class Clock(Descriptor):
+    __slots__ = ('short', 'long')
+
     def __init__(self):
         super().__init__()
         self.short = 1
@@ -123,6 +173,8 @@ class Clock(Descriptor):
 
 
 class Adder(Descriptor):
+    __slots__ = ('width',)
+
     def __init__(self, width=1):
         super().__init__()
         self.width = width
@@ -137,6 +189,58 @@ class Adder(Descriptor):
         yield 'sum', self.width
 
 
+class RAM(Descriptor):
+    __slots__ = ('address_width', 'data_width')
+
+    def __init__(self, address_width=8, data_width=8):
+        super().__init__()
+        self.address_width = address_width
+        self.data_width = data_width
+
+    def all_inputs(self):
+        yield 'clock', 1
+        yield 'write', 1
+        yield 'address', self.address_width
+        yield 'data', self.data_width
+
+    def all_outputs(self):
+        yield 'out', self.data_width
+
+    def all_internals(self):
+        yield 'prevclock', 1
+
+    def all_memories(self):
+        yield 'memory', self.data_width, 1 << self.address_width
+
+
+class ROM(Descriptor):
+    __slots__ = ('address_width', 'data_width')
+
+    def __init__(self, address_width=8, data_width=8):
+        super().__init__()
+        self.address_width = address_width
+        self.data_width = data_width
+
+    def all_inputs(self):
+        yield 'address', self.address_width
+
+    def all_outputs(self):
+        yield 'out', self.data_width
+
+
+_FLYWEIGHTS = WeakValueDictionary()
+
+
+def flyweight(desc: Descriptor):
+    if isinstance(desc, Composite):
+        return desc
+    key = type(desc), desc._params(desc)
+    shared = _FLYWEIGHTS.get(key)
+    if shared is None:
+        _FLYWEIGHTS[key] = shared = desc
+    return shared
+
+
 class Composite(Descriptor):
     def __init__(self):
         super().__init__()
@@ -163,6 +267,22 @@ class Composite(Descriptor):
     def get_child(self, name) -> Descriptor:
         return self.graph.nodes[name]['descriptor']
 
+    def structural_hash(self, memo=None):
+        if memo is None:
+            memo = dict()
+        if id(self) in memo:
+            return memo[id(self)]
+
+        h = blake2b(digest_size=16)
+        for name in self.graph.nodes:
+            h.update(repr(name).encode())
+            h.update(self.get_child(name).structural_hash(memo))
+        h.update(repr(list(self.graph.edges)).encode())
+        h.update(repr(sorted(self.connections)).encode())
+
+        memo[id(self)] = digest = h.digest()
+        return digest
+
     def all_inputs(self):
         for name, data in self.graph.nodes.items():
             desc = data['descriptor']
@@ -0,0 +1,271 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from ctypes import CFUNCTYPE, c_uint64, c_void_p
+
+import llvmlite.ir as ll
+import numpy as np
+
+from .descriptors import Composite
+from .netlist import Netlist
+from .optimizer import optimize
+from .simulator import _compile, _mask
+from .truthtable import LANE_TYPE, LANES, emit_sliced
+
+
+GOLDEN = 0x9e3779b97f4a7c15
+MIX1 = 0xbf58476d1ce4e5b9
+MIX2 = 0x94d049bb133111eb
+
+
+def _mix(x):
+    x = (x ^ x >> 30) * MIX1 & _mask(64)
+    x = (x ^ x >> 27) * MIX2 & _mask(64)
+    return x ^ x >> 31
+
+
+def _emit_mix(b: ll.IRBuilder, x):
+    def step(x, shift, factor):
+        x = b.xor(x, b.lshr(x, ll.Constant(LANE_TYPE, shift)))
+        return b.mul(x, ll.Constant(LANE_TYPE, factor))
+
+    x = step(x, 30, MIX1)
+    x = step(x, 27, MIX2)
+    return b.xor(x, b.lshr(x, ll.Constant(LANE_TYPE, 31)))
+
+
+def _random_plane(seed, index):
+    return _mix(seed + (index + 1) * GOLDEN & _mask(64))
+
+
+def _emit_pair(b: ll.IRBuilder, left: Netlist, right: Netlist, inputs, pins, planes):
+    nets_left = dict()
+    nets_right = dict()
+    for name, width in inputs:
+        nets_left['/' + name + '/pin'] = planes[:width]
+        nets_right['/' + pins[name] + '/pin'] = planes[:width]
+        planes = planes[width:]
+
+    return (emit_sliced(b, left, nets_left),
+            emit_sliced(b, right, nets_right))
+
+
+def _output_planes(left, right, get_left, get_right, outputs, pins):
+    for name, width in outputs:
+        yield from zip(get_left(left.net('/' + name + '/pin'), width),
+                       get_right(right.net('/' + pins[name] + '/pin'), width))
+
+
+def _emit_check(mod: ll.Module, name, left, right, inputs, outputs, pins):
+    int_ptr = LANE_TYPE.as_pointer()
+    func_type = ll.FunctionType(
+        LANE_TYPE, (LANE_TYPE, LANE_TYPE, LANE_TYPE, int_ptr, LANE_TYPE, int_ptr))
+
+    func = ll.Function(mod, func_type, name=name)
+    begin, end, seed, corners, corner_words, diff_p = func.args
+    b_entry = func.append_basic_block()
+    b_loop = func.append_basic_block()
+    b_body = func.append_basic_block()
+    b_next = func.append_basic_block()
+    b_found = func.append_basic_block()
+    b_exit = func.append_basic_block()
+    b = ll.IRBuilder()
+
+    one = ll.Constant(LANE_TYPE, 1)
+    num_bits = sum(map(lambda p: p[1], inputs))
+
+    b.position_at_end(b_entry)
+    w_p = b.alloca(LANE_TYPE)
+    b.store(begin, w_p)
+    b.branch(b_loop)
+
+    b.position_at_end(b_loop)
+    w = b.load(w_p)
+    b.cbranch(b.icmp_unsigned('>=', w, end), b_exit, b_body)
+
+    b.position_at_end(b_body)
+    is_corner = b.icmp_unsigned('<', w, corner_words)
+    corner = b.select(is_corner, w, b.sub(corner_words, one))
+    base = b.mul(w, ll.Constant(LANE_TYPE, num_bits))
+
+    planes = list()
+    for k in range(num_bits):
+        index = b.add(b.mul(ll.Constant(LANE_TYPE, k), corner_words), corner)
+        fixed = b.load(b.gep(corners, (index,), inbounds=True))
+        index = b.add(base, ll.Constant(LANE_TYPE, k + 1))
+        random = _emit_mix(b, b.add(seed, b.mul(index, ll.Constant(LANE_TYPE, GOLDEN))))
+        planes.append(b.select(is_corner, fixed, random))
+
+    get_left, get_right = _emit_pair(b, left, right, inputs, pins, planes)
+
+    diff = ll.Constant(LANE_TYPE, 0)
+    for x, y in _output_planes(left, right, get_left, get_right, outputs, pins):
+        diff = b.or_(diff, b.xor(x, y))
+    b.cbranch(b.icmp_unsigned('!=', diff, ll.Constant(LANE_TYPE, 0)),
+              b_found, b_next)
+
+    b.position_at_end(b_next)
+    b.store(b.add(w, one), w_p)
+    b.branch(b_loop)
+
+    b.position_at_end(b_found)
+    b.store(diff, diff_p)
+    b.ret(w)
+
+    b.position_at_end(b_exit)
+    b.ret(end)
+
+    return func
+
+
+def _emit_probe(mod: ll.Module, name, left, right, inputs, outputs, pins):
+    int_ptr = LANE_TYPE.as_pointer()
+    func_type = ll.FunctionType(ll.VoidType(), (int_ptr, int_ptr))
+
+    func = ll.Function(mod, func_type, name=name)
+    planes_in, planes_out = func.args
+    b = ll.IRBuilder(func.append_basic_block())
+
+    num_bits = sum(map(lambda p: p[1], inputs))
+    planes = list(map(lambda k: b.load(b.gep(
+        planes_in, (ll.Constant(LANE_TYPE, k),), inbounds=True)), range(num_bits)))
+
+    get_left, get_right = _emit_pair(b, left, right, inputs, pins, planes)
+
+    pairs = list(_output_planes(left, right, get_left, get_right, outputs, pins))
+    for k, (x, y) in enumerate(pairs):
+        for plane, offset in ((x, k), (y, k + len(pairs))):
+            b.store(plane, b.gep(planes_out, (ll.Constant(LANE_TYPE, offset),),
+                                 inbounds=True))
+    b.ret_void()
+
+    return func
+
+
+def _corner_planes(num_bits):
+    rows = [np.zeros(num_bits, np.uint8), np.ones(num_bits, np.uint8)]
+    for k in range(num_bits):
+        row = np.zeros(num_bits, np.uint8)
+        row[k] = 1
+        rows.append(row)
+        rows.append(1 - row)
+
+    rows.extend([rows[0]] * (-len(rows) % LANES))
+    bits = np.ascontiguousarray(np.stack(rows, 1))
+    return np.packbits(bits, 1, bitorder='little').view('<u8')
+
+
+def _split_values(bits, ports):
+    values = dict()
+    for name, width in ports:
+        values[name] = sum(map(lambda i: bits[i] << i, range(width)))
+        bits = bits[width:]
+    return values
+
+
+class EquivalenceResult:
+    def __init__(self, vectors, inputs=None, left=None, right=None):
+        self.vectors = vectors
+        self.inputs = inputs
+        self.left = left
+        self.right = right
+
+    @property
+    def equivalent(self):
+        return self.inputs is None
+
+    def __bool__(self):
+        return self.equivalent
+
+    def __str__(self):
+        if self.equivalent:
+            return f'equivalent on {self.vectors} vectors'
+        inputs = ', '.join(map(lambda p: f'{p[0]}={p[1]}', self.inputs.items()))
+        lines = [f'mismatch at vector {self.vectors - 1}: {inputs}']
+        for name, value in self.left.items():
+            if value != self.right[name]:
+                lines.append(f'  {name}: {value} != {self.right[name]}')
+        return '\n'.join(lines)
+
+
+def _check_ports(left_ports, right_ports, pins, kind):
+    right_ports = dict(right_ports)
+    for name, width in left_ports:
+        other = pins.get(name, name)
+        if other not in right_ports:
+            raise ValueError(f'{kind} {name} has no counterpart {other}')
+        if right_ports.pop(other) != width:
+            raise ValueError(f'{kind} {name} and {other} differ in width')
+    if right_ports:
+        raise ValueError(f'unmapped {kind}s: ' + ', '.join(right_ports))
+
+
+def check_equivalence(left: Composite, right: Composite, pins=None,
+                      vectors=1 << 20, seed=0, num_threads=None):
+    inputs = list(left.all_inputs())
+    outputs = list(left.all_outputs())
+
+    pins = dict(pins or ())
+    _check_ports(inputs, right.all_inputs(), pins, 'input')
+    _check_ports(outputs, right.all_outputs(), pins, 'output')
+    for name, _ in inputs + outputs:
+        pins.setdefault(name, name)
+
+    netlists = list()
+    for root, names in ((left, map(lambda p: p[0], outputs)),
+                        (right, map(lambda p: pins[p[0]], outputs))):
+        netlist = Netlist(root)
+        optimize(netlist, map(lambda name: '/' + name + '/pin', names))
+        netlists.append(netlist)
+
+    mod = ll.Module()
+    _emit_check(mod, 'check', *netlists, inputs, outputs, pins)
+    _emit_probe(mod, 'probe', *netlists, inputs, outputs, pins)
+    _, _, ee = _compile(mod)
+    check = CFUNCTYPE(c_uint64, c_uint64, c_uint64, c_uint64, c_void_p, c_uint64,
+                      c_void_p)(ee.get_function_address('check'))
+    probe = CFUNCTYPE(None, c_void_p, c_void_p)(ee.get_function_address('probe'))
+
+    num_bits = sum(map(lambda p: p[1], inputs))
+    seed &= _mask(64)
+    corners = _corner_planes(num_bits)
+    corner_words = corners.shape[1]
+    words = max(corner_words, (vectors + LANES - 1) // LANES)
+
+    if num_threads is None:
+        num_threads = os.cpu_count() or 1
+    chunks = min(words, num_threads * 4)
+    bounds = list(map(lambda i: words * i // chunks, range(chunks + 1)))
+    diffs = np.zeros(chunks, np.uint64)
+
+    def run(i):
+        return check(bounds[i], bounds[i + 1], seed, corners.ctypes.data,
+                     corner_words, diffs[i:].ctypes.data)
+
+    with ThreadPoolExecutor(num_threads) as pool:
+        found = list(filter(lambda p: p[1] < bounds[p[0] + 1],
+                            enumerate(pool.map(run, range(chunks)))))
+
+    if not found:
+        return EquivalenceResult(words * LANES)
+
+    i, w = found[0]
+    lane = (int(diffs[i]) & -int(diffs[i])).bit_length() - 1
+
+    if w < corner_words:
+        planes = list(map(int, corners[:, w]))
+    else:
+        planes = list(map(lambda k: _random_plane(seed, w * num_bits + k),
+                          range(num_bits)))
+    bits = list(map(lambda plane: plane >> lane & 1, planes))
+
+    planes_in = np.array(list(map(lambda bit: _mask(LANES) * bit, bits)) or [0],
+                         np.uint64)
+    num_out = sum(map(lambda p: p[1], outputs))
+    planes_out = np.zeros(max(1, 2 * num_out), np.uint64)
+    probe(planes_in.ctypes.data, planes_out.ctypes.data)
+    out_bits = list(map(lambda plane: int(plane) & 1, planes_out))
+
+    return EquivalenceResult(w * LANES + lane + 1,
+                             _split_values(bits, inputs),
+                             _split_values(out_bits[:num_out], outputs),
+                             _split_values(out_bits[num_out:], outputs))
@@ -0,0 +1,188 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from ctypes import CFUNCTYPE, POINTER, byref, c_uint64, c_void_p
+
+import llvmlite.ir as ll
+import numpy as np
+
+from .descriptors import Composite
+from .netlist import Netlist
+from .simulator import _compile, _mask
+from .truthtable import LANE_TYPE, LANES, emit_sliced
+
+
+FAULTY_LANES = LANES - 1
+
+
+def fault_sites(netlist: Netlist, inputs):
+    sites = list(map(lambda p: ('/' + p[0] + '/pin', p[1]), inputs))
+    for desc, path in netlist.cells:
+        sites.extend(netlist.iter_outputs(desc, path))
+    return sites
+
+
+def _site_offsets(sites):
+    offsets = dict()
+    bit = 0
+    for net, width in sites:
+        offsets[net] = bit
+        bit += width
+    return offsets, bit
+
+
+def _emit_grade(mod: ll.Module, name, netlist: Netlist, inputs, outputs, offsets):
+    int_ptr = LANE_TYPE.as_pointer()
+    func_type = ll.FunctionType(
+        LANE_TYPE, (int_ptr, LANE_TYPE, int_ptr, int_ptr, LANE_TYPE, int_ptr))
+
+    func = ll.Function(mod, func_type, name=name)
+    stimulus, count, force, values, active, evaluated = func.args
+    b_entry = func.append_basic_block()
+    b_loop = func.append_basic_block()
+    b_body = func.append_basic_block()
+    b_next = func.append_basic_block()
+    b_exit = func.append_basic_block()
+    b = ll.IRBuilder()
+    b_masks = ll.IRBuilder(b_entry)
+
+    zero = ll.Constant(LANE_TYPE, 0)
+    one = ll.Constant(LANE_TYPE, 1)
+
+    v_p = b_masks.alloca(LANE_TYPE)
+    detected_p = b_masks.alloca(LANE_TYPE)
+    b_masks.store(zero, v_p)
+    b_masks.store(zero, detected_p)
+
+    b.position_at_end(b_loop)
+    v = b.load(v_p)
+    b.cbranch(b.icmp_unsigned('>=', v, count), b_exit, b_body)
+
+    b.position_at_end(b_body)
+
+    def inject(net, planes):
+        def stuck(bit, plane):
+            index = ll.Constant(LANE_TYPE, offsets[net] + bit)
+            f = b_masks.load(b_masks.gep(force, (index,), inbounds=True))
+            s = b_masks.load(b_masks.gep(values, (index,), inbounds=True))
+            return b.or_(b.and_(plane, b.not_(f)), s)
+        return list(map(lambda p: stuck(*p), enumerate(planes)))
+
+    nets = dict()
+    row = b.mul(v, ll.Constant(LANE_TYPE, len(inputs)))
+    for i, (name, width) in enumerate(inputs):
+        value = b.load(b.gep(stimulus, (b.add(row, ll.Constant(LANE_TYPE, i)),),
+                             inbounds=True))
+        planes = list(map(lambda bit: b.neg(b.and_(
+            b.lshr(value, ll.Constant(LANE_TYPE, bit)), one)), range(width)))
+        nets['/' + name + '/pin'] = inject('/' + name + '/pin', planes)
+
+    get_planes = emit_sliced(b, netlist, nets, inject)
+
+    diff = zero
+    for name, width in outputs:
+        for plane in get_planes(netlist.net('/' + name + '/pin'), width):
+            good = b.neg(b.and_(plane, one))
+            diff = b.or_(diff, b.xor(plane, good))
+
+    detected = b.or_(b.load(detected_p), b.and_(diff, active))
+    b.store(detected, detected_p)
+    b.store(b.add(v, one), v_p)
+    b.cbranch(b.icmp_unsigned('==', detected, active), b_exit, b_next)
+
+    b.position_at_end(b_next)
+    b.branch(b_loop)
+
+    b.position_at_end(b_exit)
+    b.store(b.load(v_p), evaluated)
+    b.ret(b.load(detected_p))
+
+    b_masks.branch(b_loop)
+
+    return func
+
+
+class FaultReport:
+    def __init__(self, faults):
+        self.faults = faults
+        self.detected = dict()
+        self.vectors = 0
+        self.evaluations = 0
+
+    @property
+    def undetected(self):
+        return list(filter(lambda f: f not in self.detected, self.faults))
+
+    @property
+    def coverage(self):
+        return len(self.detected) / len(self.faults) if self.faults else 1.0
+
+    def __str__(self):
+        lines = [f'{len(self.detected)} of {len(self.faults)} stuck-at faults '
+                 f'detected by {self.vectors} vectors, '
+                 f'coverage {self.coverage:.2%}']
+        lines.extend(map(lambda f: f'  undetected {f[0]}[{f[1]}] stuck-at-{f[2]}',
+                         self.undetected))
+        return '\n'.join(lines)
+
+
+def fault_simulate(root: Composite, stimulus, faults=None, block_size=256,
+                   num_threads=None, opt_level=2):
+    inputs = list(root.all_inputs())
+    outputs = list(root.all_outputs())
+
+    stimulus = np.ascontiguousarray(stimulus, np.uint64)
+    if stimulus.ndim != 2 or stimulus.shape[1] != len(inputs):
+        raise ValueError('stimulus must have one column per input pin')
+
+    netlist = Netlist(root)
+    sites = fault_sites(netlist, inputs)
+    offsets, num_bits = _site_offsets(sites)
+
+    mod = ll.Module()
+    _emit_grade(mod, 'grade', netlist, inputs, outputs, offsets)
+    _, _, ee = _compile(mod, opt_level)
+    grade = CFUNCTYPE(c_uint64, c_void_p, c_uint64, c_void_p, c_void_p, c_uint64,
+                      POINTER(c_uint64))(ee.get_function_address('grade'))
+
+    if faults is None:
+        faults = list()
+        for net, width in sites:
+            for i in range(width):
+                faults.extend(((net, i, 0), (net, i, 1)))
+    report = FaultReport(list(faults))
+
+    if num_threads is None:
+        num_threads = os.cpu_count() or 1
+
+    def run(batch, block):
+        force = np.zeros(max(1, num_bits), np.uint64)
+        values = np.zeros(max(1, num_bits), np.uint64)
+        for lane, (net, i, stuck) in enumerate(batch, 1):
+            force[offsets[net] + i] |= np.uint64(1 << lane)
+            if stuck:
+                values[offsets[net] + i] |= np.uint64(1 << lane)
+        active = _mask(len(batch) + 1) ^ 1
+        evaluated = c_uint64()
+        detected = grade(block.ctypes.data, len(block), force.ctypes.data,
+                         values.ctypes.data, active, byref(evaluated))
+        found = list(filter(lambda p: detected >> p[0] & 1, enumerate(batch, 1)))
+        return evaluated.value * len(batch), found
+
+    pending = list(report.faults)
+    with ThreadPoolExecutor(num_threads) as pool:
+        for start in range(0, len(stimulus), block_size):
+            if not pending:
+                break
+            block = stimulus[start:start + block_size]
+            batches = list(map(lambda i: pending[i:i + FAULTY_LANES],
+                               range(0, len(pending), FAULTY_LANES)))
+
+            for evaluations, found in pool.map(lambda batch: run(batch, block), batches):
+                report.evaluations += evaluations
+                for _, fault in found:
+                    report.detected[fault] = start + len(block)
+
+            report.vectors = start + len(block)
+            pending = list(filter(lambda f: f not in report.detected, pending))
+
+    return report
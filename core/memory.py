@@ -0,0 +1,54 @@
+import mmap
+from ctypes import c_char
+
+import numpy as np
+
+from .simulator import CompiledExecutor, element_size
+
+
+_DTYPES = {
+    1: np.uint8,
+    2: np.uint16,
+    4: np.uint32,
+    8: np.uint64
+}
+
+
+def load_memory(executor: CompiledExecutor, path, filename):
+    buffer, _, _ = executor.get_memory(path)
+    size = len(buffer)
+
+    with open(filename, 'rb') as f:
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    if executor.is_rom(path):
+        if len(m) >= size:
+            executor.set_image(path, (c_char * size).from_buffer(m))
+            return
+        buffer = (c_char * size)()
+        executor.set_image(path, buffer)
+
+    try:
+        n = min(size, len(m))
+        buffer[:n] = m[:n]
+        buffer[n:] = bytes(size - n)
+    finally:
+        m.close()
+
+
+def dump_memory(executor: CompiledExecutor, path, filename):
+    buffer, _, _ = executor.get_memory(path)
+    size = len(buffer)
+
+    with open(filename, 'w+b') as f:
+        f.truncate(size)
+        with mmap.mmap(f.fileno(), size) as m:
+            m[:] = buffer
+
+
+def memory_array(executor: CompiledExecutor, path):
+    buffer, width, count = executor.get_memory(path)
+    size = element_size(width)
+    if size in _DTYPES:
+        return np.frombuffer(buffer, _DTYPES[size], count)
+    return np.frombuffer(buffer, np.uint64).reshape(count, size // 8)
@@ -0,0 +1,212 @@
+from collections import OrderedDict
+
+import networkx as nx
+
+from .descriptors import Composite, ExposedPin
+
+
+class Elaboration:
+    def __init__(self):
+        self.pins = list()
+        self.memories = list()
+        self.connections = list()
+        self.topology = list()
+        self.rooted = dict()
+
+    def stamp(self, other, prefix):
+        self.pins.extend(map(lambda p: (prefix + p[0], p[1], p[2]), other.pins))
+        self.memories.extend(
+            map(lambda m: (prefix + m[0], m[1], m[2]), other.memories))
+        self.connections.extend(
+            map(lambda c: (prefix + c[0], prefix + c[1]), other.connections))
+
+    def stamp_topology(self, other, prefix):
+        for op, data in other.topology:
+            if op == 'emit':
+                self.topology.append((op, (data[0], prefix + data[1])))
+            else:
+                self.topology.append(
+                    (op, (prefix + data[0], prefix + data[1])))
+
+
+class ElaborationCache:
+    def __init__(self, maxsize=256):
+        self.entries = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        self.entries[key] = result
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self):
+        return (f'{len(self.entries)} definitions, '
+                f'{self.hits} hits, {self.misses} misses')
+
+
+elaboration_cache = ElaborationCache()
+
+
+def _own_connections(node: Composite, name):
+    for conn in node.connections:
+        if conn[0].split('/')[0] != name:
+            continue
+        yield conn[0] + '/' + conn[1], conn[2] + '/' + conn[3]
+
+
+def elaborate(node: Composite, cache=None, memo=None) -> Elaboration:
+    if cache is None:
+        cache = elaboration_cache
+    if memo is None:
+        memo = dict()
+
+    key = node.structural_hash(memo)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    result = Elaboration()
+    children = dict()
+
+    for name in node.graph.nodes:
+        desc = node.get_child(name)
+        prefix = name + '/'
+
+        if isinstance(desc, Composite):
+            children[name] = elaborate(desc, cache, memo)
+            result.stamp(children[name], prefix)
+        else:
+            result.pins.extend(map(lambda p: (prefix + p[0], p[1], 'in'), desc.all_inputs()))
+            result.pins.extend(map(lambda p: (prefix + p[0], p[1], 'out'), desc.all_outputs()))
+            result.pins.extend(map(lambda p: (prefix + p[0], p[1], 'internal'), desc.all_internals()))
+            result.memories.extend(map(lambda m: (prefix + m[0], m[1], m[2]), desc.all_memories()))
+
+        result.connections.extend(_own_connections(node, name))
+
+    for name in nx.dfs_postorder_nodes(node.graph):
+        desc = node.get_child(name)
+
+        if isinstance(desc, Composite):
+            result.stamp_topology(children[name], name + '/')
+        else:
+            result.topology.append(('emit', (desc, name + '/')))
+
+        result.topology.extend(map(lambda c: ('propagate', c),
+                                   _own_connections(node, name)))
+
+    cache.put(key, result)
+    return result
+
+
+def _rooted(node: Composite, kind, path, prefix):
+    result = elaborate(node)
+    cached = result.rooted.get(kind)
+    if cached is None or cached[0] != path:
+        cached = result.rooted[kind] = path, list(
+            map(lambda e: prefix(path, e), getattr(result, kind)))
+    return cached[1]
+
+
+def _prefix_topology(path, entry):
+    op, data = entry
+    if op == 'emit':
+        return op, (data[0], path + data[1])
+    return op, (path + data[0], path + data[1])
+
+
+def iter_simulation_pins(node: Composite, path='/'):
+    yield from _rooted(node, 'pins', path,
+                       lambda path, p: (path + p[0], p[1], p[2]))
+
+
+def iter_simulation_memories(node: Composite, path='/'):
+    yield from _rooted(node, 'memories', path,
+                       lambda path, m: (path + m[0], m[1], m[2]))
+
+
+def iter_simulation_connections(node: Composite, path='/'):
+    yield from _rooted(node, 'connections', path,
+                       lambda path, c: (path + c[0], path + c[1]))
+
+
+def iter_simulation_topology(node: Composite, path='/'):
+    yield from _rooted(node, 'topology', path, _prefix_topology)
+
+
+def _map_to_sources(desc: Composite):
+    conns = dict()
+    for src, dest in iter_simulation_connections(desc):
+        conns[dest] = src
+
+    def _trace_pin(path):
+        curr = path
+        if curr not in conns:
+            return None
+        while curr in conns:
+            curr = conns[curr]
+        return curr
+
+    traces = dict()
+
+    for pin, _, _ in iter_simulation_pins(desc):
+        traces[pin] = _trace_pin(pin)
+
+    return traces
+
+
+def is_stateful(desc):
+    return any(True for _ in desc.all_internals())
+
+
+def is_clocked(desc):
+    return (any(pin == 'clock' for pin, _ in desc.all_inputs())
+            and any(pin == 'prevclock' for pin, _ in desc.all_internals()))
+
+
+class Netlist:
+    def __init__(self, root: Composite):
+        self.root = root
+        self.pin_map = _map_to_sources(root)
+        self.inputs = dict()
+        self.cells = list()
+        self.constants = dict()
+        self.clock_domains = None
+
+        for op, data in iter_simulation_topology(root):
+            if op == 'emit' and not isinstance(data[0], ExposedPin):
+                self.cells.append(data)
+
+    def net(self, pin):
+        source = self.pin_map.get(pin)
+        return pin if source is None else source
+
+    def pin(self, path, pin):
+        return self.net(self.inputs.get(path + pin, path + pin))
+
+    def connect(self, path, nets):
+        for i, net in enumerate(nets):
+            self.inputs[path + f'in{i}'] = net
+
+    def iter_inputs(self, desc, path):
+        for pin, width in desc.all_inputs():
+            yield self.pin(path, pin), width
+
+    def iter_outputs(self, desc, path):
+        for pin, width in desc.all_outputs():
+            yield self.pin(path, pin), width
@@ -0,0 +1,464 @@
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import and_, or_, xor
+
+from .descriptors import Adder, Composite, Constant, Gate, Not
+from .netlist import Netlist, is_clocked, is_stateful, iter_simulation_pins
+
+
+_GATE_OPS = {
+    Gate.AND: and_,
+    Gate.OR: or_,
+    Gate.XOR: xor
+}
+
+
+def _mask(width):
+    return (1 << width) - 1
+
+
+class OptimizationReport:
+    def __init__(self):
+        self.folded = list()
+        self.simplified = list()
+        self.removed = list()
+        self.internal = set()
+        self.domains = 0
+        self.gated = list()
+        self.collapsed = list()
+        self.merged = list()
+        self.shared = list()
+        self.before = Counter()
+        self.after = Counter()
+
+    def __str__(self):
+        lines = [f'folded {len(self.folded)}, simplified {len(self.simplified)}, '
+                 f'collapsed {len(self.collapsed)}, merged {len(self.merged)}, '
+                 f'shared {len(self.shared)}, '
+                 f'removed {len(self.removed)} elements, '
+                 f'{len(self.internal)} internal nets, '
+                 f'{len(self.gated)} elements gated by {self.domains} clock domains']
+        lines.append('cells ' + ', '.join(map(
+            lambda tp: f'{tp} {self.before[tp]} -> {self.after[tp]}',
+            sorted(self.before | self.after))))
+        lines.extend(map(lambda p: '  folded ' + p, self.folded))
+        lines.extend(map(lambda p: '  simplified ' + p, self.simplified))
+        lines.extend(map(lambda p: '  collapsed ' + p, self.collapsed))
+        lines.extend(map(lambda p: '  merged ' + p, self.merged))
+        lines.extend(map(lambda p: '  shared ' + p, self.shared))
+        lines.extend(map(lambda p: '  removed ' + p, self.removed))
+        lines.extend(map(lambda p: '  gated ' + p, self.gated))
+        return '\n'.join(lines)
+
+
+def default_observed(root: Composite):
+    for name in root.graph.nodes:
+        desc = root.get_child(name)
+        if isinstance(desc, Composite):
+            for pin, _ in desc.all_inputs():
+                yield '/' + name + '/' + pin + '/pin'
+            for pin, _ in desc.all_outputs():
+                yield '/' + name + '/' + pin + '/pin'
+        else:
+            for pin, _ in desc.all_pins():
+                yield '/' + name + '/' + pin
+
+
+def _fold_gate(netlist: Netlist, desc: Gate, path):
+    consts = netlist.constants
+    mask = _mask(desc.width)
+    identity = mask if desc.op == Gate.AND else 0
+    negated = desc.negated
+    kept = list()
+
+    for net, _ in netlist.iter_inputs(desc, path):
+        if net not in consts:
+            kept.append(net)
+            continue
+        value = consts[net]
+        if desc.op == Gate.AND and value == 0 or desc.op == Gate.OR and value == mask:
+            return {'out': value ^ (mask if negated else 0)}
+        if value == identity:
+            continue
+        if desc.op == Gate.XOR and value == mask:
+            negated = not negated
+            continue
+        kept.append(net)
+
+    if all(map(lambda net: net in consts, kept)):
+        value = reduce(_GATE_OPS[desc.op],
+                       map(lambda net: consts[net], kept), identity)
+        return {'out': value ^ (mask if negated else 0)}
+
+    if len(kept) == desc.num_inputs:
+        return None
+
+    netlist.connect(path, kept)
+    return Gate(desc.op, desc.width, len(kept), negated)
+
+
+def _fold_cell(netlist: Netlist, desc, path):
+    consts = netlist.constants
+    inputs = dict(map(lambda p: (p[0], netlist.pin(path, p[0])),
+                      desc.all_inputs()))
+    tp = type(desc)
+
+    if tp is Gate:
+        return _fold_gate(netlist, desc, path)
+
+    if not all(map(lambda net: net in consts, inputs.values())):
+        return None
+
+    if tp is Not:
+        return {'out': ~consts[inputs['in']] & _mask(desc.width)}
+
+    if tp is Adder:
+        mask = _mask(desc.width)
+        s = consts[inputs['a']] + consts[inputs['b']] + consts[inputs['cin']]
+        return {'sum': s & mask, 'cout': s >> desc.width & 1}
+
+    return None
+
+
+def _no_group(path):
+    return None
+
+
+def fold_constants(netlist: Netlist, report: OptimizationReport, group=_no_group):
+    cells = list()
+    first_reader = dict()
+    readers = defaultdict(set)
+
+    for i, (desc, path) in enumerate(netlist.cells):
+        for net, _ in netlist.iter_inputs(desc, path):
+            first_reader.setdefault(net, i)
+            readers[net].add(group(path))
+        if type(desc) is Constant:
+            net = netlist.pin(path, 'out')
+            netlist.constants[net] = desc.value & _mask(desc.width)
+        else:
+            cells.append((i, desc, path))
+
+    def read_early(i, path, pins):
+        nets = list(map(lambda pin: netlist.pin(path, pin), pins))
+        return (any(map(lambda net: first_reader.get(net, i + 1) <= i, nets))
+                or any(map(lambda net: readers[net] - {group(path)}, nets)))
+
+    changed = True
+    while changed:
+        changed = False
+        remaining = list()
+
+        for i, desc, path in cells:
+            result = _fold_cell(netlist, desc, path)
+            if result is None:
+                remaining.append((i, desc, path))
+            elif isinstance(result, dict):
+                if read_early(i, path, result):
+                    remaining.append((i, desc, path))
+                    continue
+                for pin, value in result.items():
+                    netlist.constants[netlist.pin(path, pin)] = value
+                report.folded.append(path)
+                changed = True
+            else:
+                remaining.append((i, result, path))
+                report.simplified.append(path)
+                changed = True
+
+        cells = remaining
+
+    netlist.cells = list(map(lambda cell: cell[1:], cells))
+
+
+def _is_buffer(desc):
+    return type(desc) is Gate and desc.num_inputs == 1 and not desc.negated
+
+
+def _is_inverter(desc):
+    return type(desc) is Not or (type(desc) is Gate and desc.num_inputs == 1
+                                 and desc.negated)
+
+
+def _share_key(desc, inputs):
+    tp = type(desc)
+    if tp is Gate:
+        inputs = sorted(inputs)
+    elif tp is Adder:
+        inputs = sorted(inputs[:2]) + inputs[2:]
+    elif tp is not Not:
+        return None
+    return tp, desc.params(), tuple(inputs)
+
+
+def _feed_forward_cells(netlist: Netlist):
+    position = dict()
+    first_reader = dict()
+    for i, (desc, path) in enumerate(netlist.cells):
+        for net, _ in netlist.iter_inputs(desc, path):
+            first_reader.setdefault(net, i)
+        for net, _ in netlist.iter_outputs(desc, path):
+            position[net] = i
+
+    clean = set()
+    for i, (desc, path) in enumerate(netlist.cells):
+        if is_stateful(desc):
+            continue
+        if any(map(lambda p: position.get(p[0], -1) >= i,
+                   netlist.iter_inputs(desc, path))):
+            continue
+        if any(map(lambda p: first_reader.get(p[0], i + 1) <= i,
+                   netlist.iter_outputs(desc, path))):
+            continue
+        clean.add(path)
+    return clean
+
+
+def simplify_gates(netlist: Netlist, observed, report: OptimizationReport,
+                   group=_no_group):
+    widths = dict(map(lambda p: p[:2], iter_simulation_pins(netlist.root)))
+    aliases = defaultdict(set)
+    for pin in netlist.pin_map:
+        aliases[netlist.net(pin)].add(pin)
+
+    consumers = Counter()
+    for desc, path in netlist.cells:
+        consumers.update(map(lambda p: p[0], netlist.iter_inputs(desc, path)))
+
+    def replace(old, new):
+        if old == new:
+            return
+        for pin in aliases.pop(old, ()):
+            netlist.pin_map[pin] = new
+            aliases[new].add(pin)
+        consumers[new] += consumers.pop(old, 0)
+
+    def rewire(desc, path, inputs):
+        netlist.connect(path, inputs)
+        return desc
+
+    def inputs_of(desc, path):
+        return list(map(lambda p: p[0], netlist.iter_inputs(desc, path)))
+
+    def private(net):
+        return consumers[net] == 1 and net not in observed_nets
+
+    def local(path, nets):
+        return all(map(lambda net: sources.get(net) == group(path), nets))
+
+    changed = True
+    while changed:
+        changed = False
+        observed_nets = set(map(netlist.net, observed))
+        clean = _feed_forward_cells(netlist)
+        sources = dict()
+        for desc, path in netlist.cells:
+            for net, _ in netlist.iter_outputs(desc, path):
+                sources[net] = group(path)
+        producers = dict()
+        shared = dict()
+        cells = list()
+
+        for desc, path in netlist.cells:
+            if path not in clean:
+                cells.append((desc, path))
+                continue
+
+            inputs = inputs_of(desc, path)
+
+            if (_is_buffer(desc) and widths.get(inputs[0]) == desc.width
+                    and local(path, inputs)):
+                replace(netlist.pin(path, 'out'), inputs[0])
+                report.collapsed.append(path)
+                changed = True
+                continue
+
+            source = producers.get(inputs[0]) if inputs else None
+            if _is_inverter(desc) and source is not None and local(path, inputs):
+                src, src_path = source
+                src_inputs = inputs_of(src, src_path)
+                if (_is_inverter(src) and src.width == desc.width
+                        and widths.get(src_inputs[0]) == desc.width
+                        and local(path, src_inputs)):
+                    replace(netlist.pin(path, 'out'), src_inputs[0])
+                    report.collapsed.append(path)
+                    changed = True
+                    continue
+                if (type(src) is Gate and src.width == desc.width
+                        and private(inputs[0])):
+                    consumers.subtract(inputs)
+                    consumers.update(src_inputs)
+                    desc = rewire(src.replace(negated=not src.negated), path,
+                                  src_inputs)
+                    inputs = src_inputs
+                    report.merged.append(path)
+                    changed = True
+
+            if type(desc) is Gate and desc.num_inputs > 1:
+                merged = list()
+                for net in inputs:
+                    src, src_path = producers.get(net, (None, None))
+                    if (type(src) is Gate and src.op == desc.op and not src.negated
+                            and src.width == desc.width and private(net)
+                            and local(path, (net,))):
+                        merged.extend(inputs_of(src, src_path))
+                    else:
+                        merged.append(net)
+                if len(merged) != len(inputs):
+                    consumers.subtract(inputs)
+                    consumers.update(merged)
+                    desc = rewire(desc.replace(num_inputs=len(merged)), path,
+                                  merged)
+                    inputs = merged
+                    report.merged.append(path)
+                    changed = True
+
+            key = _share_key(desc, inputs)
+            if key is not None:
+                key = key + (group(path),)
+            if key is not None and key in shared:
+                other = shared[key]
+                for pin, _ in desc.all_outputs():
+                    replace(netlist.pin(path, pin), netlist.pin(other, pin))
+                consumers.subtract(inputs)
+                report.shared.append(path)
+                changed = True
+                continue
+            if key is not None:
+                shared[key] = path
+
+            for net, _ in netlist.iter_outputs(desc, path):
+                producers[net] = desc, path
+            cells.append((desc, path))
+
+        netlist.cells = cells
+
+
+def eliminate_dead_cells(netlist: Netlist, observed, report: OptimizationReport):
+    producers = dict()
+    for i, (desc, path) in enumerate(netlist.cells):
+        for net, _ in netlist.iter_outputs(desc, path):
+            producers[net] = i
+
+    live = set()
+    worklist = list(map(netlist.net, observed))
+
+    for i, (desc, path) in enumerate(netlist.cells):
+        if is_stateful(desc):
+            live.add(i)
+            worklist.extend(map(lambda p: p[0], netlist.iter_inputs(desc, path)))
+
+    while worklist:
+        i = producers.get(worklist.pop())
+        if i is None or i in live:
+            continue
+        live.add(i)
+        desc, path = netlist.cells[i]
+        worklist.extend(map(lambda p: p[0], netlist.iter_inputs(desc, path)))
+
+    report.removed.extend(map(lambda t: t[1][1], filter(
+        lambda t: t[0] not in live, enumerate(netlist.cells))))
+    netlist.cells = list(map(lambda i: netlist.cells[i], sorted(live)))
+
+
+def find_internal_nets(netlist: Netlist, observed):
+    persistent = set(map(netlist.net, observed))
+    written = set(netlist.constants)
+
+    for desc, path in netlist.cells:
+        for net, _ in netlist.iter_inputs(desc, path):
+            if net not in written:
+                persistent.add(net)
+
+        outputs = list(map(lambda p: p[0], netlist.iter_outputs(desc, path)))
+        if is_stateful(desc):
+            persistent.update(outputs)
+        written.update(outputs)
+
+    return written - persistent
+
+
+class ClockDomains:
+    def __init__(self):
+        self.domains = defaultdict(list)
+        self.cones = defaultdict(list)
+        self.stable = set()
+
+    def gated(self):
+        for members in self.cones.values():
+            yield from members
+
+
+def find_clock_domains(netlist: Netlist, internal):
+    cells = netlist.cells
+    producers = dict()
+    consumers = defaultdict(list)
+
+    for i, (desc, path) in enumerate(cells):
+        for pin, _ in desc.all_inputs():
+            consumers[netlist.pin(path, pin)].append((i, pin))
+        for net, _ in netlist.iter_outputs(desc, path):
+            producers[net] = i
+
+    result = ClockDomains()
+    owner = dict()
+
+    for i in reversed(range(len(cells))):
+        desc, path = cells[i]
+
+        if is_clocked(desc):
+            result.domains[netlist.pin(path, 'clock')].insert(0, i)
+            continue
+        if is_stateful(desc):
+            continue
+
+        outputs = list(map(lambda p: p[0], netlist.iter_outputs(desc, path)))
+        if not outputs or any(map(lambda net: net not in internal, outputs)):
+            continue
+
+        owners = set()
+        for net in outputs:
+            for j, pin in consumers[net]:
+                if j in owner:
+                    owners.add(owner[j])
+                elif is_clocked(cells[j][0]) and pin != 'clock':
+                    owners.add(j)
+                else:
+                    owners.add(None)
+        if len(owners) != 1 or None in owners:
+            continue
+
+        inputs = map(lambda p: p[0], netlist.iter_inputs(desc, path))
+        if any(map(lambda net: producers.get(net, -1) >= i, inputs)):
+            continue
+
+        owner[i] = owners.pop()
+        result.cones[owner[i]].insert(0, i)
+
+    for clock, members in result.domains.items():
+        if producers.get(clock, -1) < members[0]:
+            result.stable.add(clock)
+
+    return result
+
+
+def optimize(netlist: Netlist, observed=None, group=_no_group):
+    report = OptimizationReport()
+
+    if observed is None:
+        observed = default_observed(netlist.root)
+    observed = list(observed)
+
+    report.before.update(map(lambda c: type(c[0]).__name__, netlist.cells))
+    fold_constants(netlist, report, group)
+    simplify_gates(netlist, observed, report, group)
+    eliminate_dead_cells(netlist, observed, report)
+    report.after.update(map(lambda c: type(c[0]).__name__, netlist.cells))
+    report.internal = find_internal_nets(netlist, observed)
+
+    netlist.clock_domains = find_clock_domains(netlist, report.internal)
+    report.domains = len(netlist.clock_domains.domains)
+    report.gated = list(map(lambda i: netlist.cells[i][1],
+                            netlist.clock_domains.gated()))
+
+    return report
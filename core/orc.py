@@ -0,0 +1,106 @@
+from itertools import count
+
+import llvmlite.ir as ll
+
+from .simulator import _load_llvm
+
+
+def split_globals(mod: ll.Module):
+    data = ll.Module()
+    variables = list(filter(lambda g: isinstance(g, ll.GlobalVariable),
+                            mod.globals.values()))
+
+    for var in variables:
+        copy = ll.GlobalVariable(data, var.value_type, var.name)
+        copy.initializer = var.initializer
+        copy.align = var.align
+
+    initializers = list(map(lambda var: var.initializer, variables))
+    for var in variables:
+        var.initializer = None
+    try:
+        ir = str(mod)
+    finally:
+        for var, initializer in zip(variables, initializers):
+            var.initializer = initializer
+
+    return ir, str(data) if variables else None
+
+
+class OrcBackend:
+    def __init__(self, ir, data=None, opt_level=3):
+        llvm = self._llvm = _load_llvm()
+
+        self.opt_level = opt_level
+        self._machine = llvm.Target.from_default_triple().create_target_machine(
+            opt=opt_level)
+        self._lljit = llvm.create_lljit_compiler(self._machine)
+        self._context = llvm.create_context()
+        self._ir = ir
+        self._libraries = dict()
+        self._generation = count()
+        self.listeners = list()
+
+        self._data = None
+        if data is not None:
+            builder = llvm.JITLibraryBuilder().add_ir(data)
+            for var in llvm.parse_assembly(data, self._context).global_variables:
+                builder.export_symbol(var.name)
+            self._data = builder.link(self._lljit, 'data')
+
+    def _library_ir(self, name):
+        llvm = self._llvm
+        llmod = llvm.parse_assembly(self._ir, self._context)
+        llmod.triple = self._machine.triple
+        llmod.data_layout = str(self._machine.target_data)
+
+        for func in llmod.functions:
+            if not func.is_declaration and func.name != name:
+                func.linkage = 'internal'
+
+        pmb = llvm.create_pass_manager_builder()
+        pmb.opt_level = self.opt_level
+        if self.opt_level > 0:
+            pmb.inlining_threshold = 10000000
+        pm = llvm.create_module_pass_manager()
+        pmb.populate(pm)
+        pm.run(llmod)
+
+        return str(llmod)
+
+    def load(self, name):
+        if name in self._libraries:
+            return self._libraries[name]
+
+        builder = self._llvm.JITLibraryBuilder()
+        builder.add_ir(self._library_ir(name))
+        builder.add_current_process()
+        if self._data is not None:
+            builder.add_jit_library('data')
+        builder.export_symbol(name)
+
+        library = builder.link(
+            self._lljit, f'{name}#{next(self._generation)}')
+        self._libraries[name] = library
+        return library
+
+    def unload(self, name):
+        library = self._libraries.pop(name, None)
+        if library is None:
+            return
+        for listener in self.listeners:
+            listener(name)
+
+    def is_loaded(self, name):
+        return name in self._libraries
+
+    def get_function_address(self, name):
+        return self.load(name)[name]
+
+    def get_global_value_address(self, name):
+        return self._data[name]
+
+
+def compile_orc(split, opt_level=3):
+    backend = OrcBackend(*split, opt_level)
+    return None, backend._machine, backend
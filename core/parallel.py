@@ -0,0 +1,312 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import llvmlite.ir as ll
+
+from .descriptors import ROM, Composite, Constant
+from .netlist import (Netlist, _map_to_sources, iter_simulation_memories,
+                      iter_simulation_pins, iter_simulation_topology)
+from .optimizer import find_clock_domains, optimize
+from .simulator import (TRANSLATOR, CompiledExecutor, StateLayout, _compile,
+                        _emit_burst, _emit_changes, _emit_netlist, _emit_step)
+
+
+def _count_elements(desc):
+    if not isinstance(desc, Composite):
+        return 1
+    return sum(map(lambda name: _count_elements(desc.get_child(name)),
+                   desc.graph.nodes))
+
+
+def partition_hierarchy(root: Composite, num_partitions):
+    weights = dict()
+    for name in root.graph.nodes:
+        weights[name] = _count_elements(root.get_child(name))
+
+    num_partitions = max(1, min(num_partitions, len(weights)))
+    partitions = [list() for _ in range(num_partitions)]
+    loads = [0] * num_partitions
+
+    for name in sorted(weights, key=lambda n: -weights[n]):
+        i = loads.index(min(loads))
+        partitions[i].append(name)
+        loads[i] += weights[name]
+
+    return partitions
+
+
+def _top_level(path):
+    return path.split('/')[1]
+
+
+def _emit_barrier(mod: ll.Module, num_threads):
+    int_type = ll.IntType(64)
+    yield_type = ll.FunctionType(ll.IntType(32), tuple())
+    yield_func = ll.Function(
+        mod, yield_type, 'sched_yield' if os.name == 'posix' else 'SwitchToThread')
+
+    count = ll.GlobalVariable(mod, int_type, 'barrier@count')
+    count.initializer = ll.Constant(int_type, 0)
+    count.align = 64
+    gen = ll.GlobalVariable(mod, int_type, 'barrier@gen')
+    gen.initializer = ll.Constant(int_type, 0)
+    gen.align = 64
+
+    func = ll.Function(mod, ll.FunctionType(
+        ll.VoidType(), tuple()), name='barrier')
+    b_entry = func.append_basic_block()
+    b_release = func.append_basic_block()
+    b_wait = func.append_basic_block()
+    b_exit = func.append_basic_block()
+    b = ll.IRBuilder()
+
+    b.position_at_end(b_entry)
+    curr = b.load_atomic(gen, 'acquire', 8)
+    old = b.atomic_rmw('add', count, ll.Constant(int_type, 1), 'acq_rel')
+    last = b.icmp_unsigned('==', old, ll.Constant(int_type, num_threads - 1))
+    b.cbranch(last, b_release, b_wait)
+
+    b.position_at_end(b_release)
+    b.store_atomic(ll.Constant(int_type, 0), count, 'monotonic', 8)
+    b.store_atomic(b.add(curr, ll.Constant(int_type, 1)), gen, 'release', 8)
+    b.ret_void()
+
+    b.position_at_end(b_wait)
+    b.call(yield_func, tuple())
+    v = b.load_atomic(gen, 'acquire', 8)
+    b.cbranch(b.icmp_unsigned('==', v, curr), b_wait, b_exit)
+
+    b.position_at_end(b_exit)
+    b.ret_void()
+
+    return func
+
+
+# Partitions only exchange values at step boundaries: a net produced in one
+# partition is seen by readers in another partition one step late, while
+# readers in the producing partition see it exactly as JIT does.
+class ParallelJIT(CompiledExecutor):
+    def __init__(self, root: Composite, burst_size, num_threads=None, partitions=None,
+                 backend='mcjit', map_pins=True, observed=None):
+        self.root = root
+
+        if partitions is None:
+            if num_threads is None:
+                num_threads = os.cpu_count() or 1
+            partitions = partition_hierarchy(root, num_threads)
+
+        self.partitions = partitions
+
+        owner = dict()
+        for i, names in enumerate(partitions):
+            for name in names:
+                owner[name] = i
+
+        def cell_owner(path):
+            return owner[_top_level(path)]
+
+        mod = self._module = ll.Module()
+
+        if map_pins:
+            netlist = Netlist(root)
+            self.report = optimize(netlist, observed, cell_owner)
+            self._pin_map = netlist.pin_map
+            constants = netlist.constants
+            cells = netlist.cells
+        else:
+            self.report = None
+            self._pin_map = _map_to_sources(root)
+            constants = dict()
+            cells = list(map(lambda op: op[1], filter(
+                lambda op: op[0] == 'emit', iter_simulation_topology(root))))
+
+        def cell_pin(path, pin):
+            if map_pins:
+                return netlist.pin(path, pin)
+            return self._get_source_path(path + pin)
+
+        producers = dict()
+        touched = defaultdict(set)
+        for desc, path in cells:
+            for pin, _ in desc.all_inputs():
+                touched[cell_pin(path, pin)].add(cell_owner(path))
+            for pin, _ in desc.all_outputs():
+                net = cell_pin(path, pin)
+                producers[net] = cell_owner(path)
+                touched[net].add(cell_owner(path))
+
+        def net_owner(path):
+            return producers.get(path, owner[_top_level(path)])
+
+        if map_pins:
+            internal = set(filter(lambda net: len(touched[net]) == 1,
+                                  self.report.internal))
+            netlist.clock_domains = find_clock_domains(netlist, internal)
+        else:
+            internal = set()
+
+        layout = StateLayout()
+
+        for i in range(len(partitions)):
+            layout.add('cycle' if i == 0 else f'cycle@p{i}', 64)
+
+        widths = dict()
+        for pin_path, pin_width, _ in iter_simulation_pins(root):
+            widths[pin_path] = pin_width
+            if self._pin_map[pin_path] is not None:
+                continue
+            if pin_path in internal:
+                continue
+            layout.add(pin_path, pin_width)
+
+        for path, width, count in iter_simulation_memories(root):
+            layout.add_array(path, width, count)
+
+        int_type = ll.IntType(64)
+
+        boundary = dict()
+        mirrors = [dict() for _ in partitions]
+        roms = list(filter(lambda cell: type(cell[0]) is ROM, cells))
+        step_funcs = list()
+        blocks = list()
+
+        for i, names in enumerate(partitions):
+            step_func = _emit_step(mod, f'step@p{i}')
+            state = step_func.args[0]
+            b_entry = step_func.append_basic_block('entry')
+            b_body = step_func.append_basic_block('body')
+            b = ll.IRBuilder(b_body)
+            b_alloca = ll.IRBuilder(b_entry)
+            local_nets = dict()
+
+            def get_global(desc, pin, i=i, b=b, state=state, b_alloca=b_alloca,
+                           local_nets=local_nets):
+                path = self._get_source_path(desc + pin)
+                if path in internal or map_pins and path in constants:
+                    if path not in local_nets:
+                        local_nets[path] = b_alloca.alloca(
+                            ll.IntType(widths[path]), name=path)
+                    return local_nets[path]
+
+                if net_owner(path) == i:
+                    return layout.pointer(b, state, path)
+
+                _, width = layout.fields[path]
+                if path not in boundary:
+                    boundary[path] = path + '@buf'
+                    layout.add(path + '@buf', width, 2)
+
+                if path not in mirrors[i]:
+                    mirrors[i][path] = path + f'@p{i}'
+                    layout.add(path + f'@p{i}', width)
+
+                return layout.pointer(b, state, mirrors[i][path])
+
+            if map_pins:
+                _emit_netlist(b, netlist, get_global, widths, set(filter(
+                    lambda j: cell_owner(cells[j][1]) == i, range(len(cells)))))
+            else:
+                for desc, path in filter(lambda c: cell_owner(c[1]) == i, cells):
+                    tp = type(desc)
+                    if tp in TRANSLATOR:
+                        TRANSLATOR[tp](b, desc, path, get_global)
+                    if tp is Constant:
+                        constants[path + 'out'] = desc.value
+
+            step_funcs.append(step_func)
+            blocks.append((b_entry, b_body, b.block))
+
+        for i, step_func in enumerate(step_funcs):
+            state = step_func.args[0]
+            b_entry, b_body, b_exit = blocks[i]
+            b = ll.IRBuilder(b_entry)
+            cycle = layout.pointer(
+                b, state, 'cycle' if i == 0 else f'cycle@p{i}')
+            curr = b.load(cycle)
+            parity = b.and_(curr, ll.Constant(int_type, 1))
+            next_parity = b.xor(parity, ll.Constant(int_type, 1))
+            for path, mirror in mirrors[i].items():
+                v = b.load(layout.pointer(b, state, boundary[path], parity))
+                b.store(v, layout.pointer(b, state, mirror))
+            b.branch(b_body)
+
+            b.position_at_end(b_exit)
+            for path, buf in boundary.items():
+                if net_owner(path) != i:
+                    continue
+                v = b.load(layout.pointer(b, state, path))
+                b.store(v, layout.pointer(b, state, buf, next_parity))
+            b.store(b.add(curr, ll.Constant(int_type, 1)), cycle)
+            b.ret_void()
+
+        sync_func = _emit_step(mod, 'sync')
+        state = sync_func.args[0]
+        b = ll.IRBuilder(sync_func.append_basic_block())
+        for path, buf in boundary.items():
+            v = b.load(layout.pointer(b, state, path))
+            for slot in range(2):
+                b.store(v, layout.pointer(
+                    b, state, buf, ll.Constant(int_type, slot)))
+        b.ret_void()
+
+        barrier_func = _emit_barrier(mod, len(partitions))
+        for i, step_func in enumerate(step_funcs):
+            _emit_burst(mod, f'burst@p{i}',
+                        (step_func, barrier_func), burst_size)
+        _emit_changes(mod, 'changes')
+
+        self._init_state(layout, step_funcs)
+
+        if backend == 'orc':
+            from .orc import compile_orc, split_globals
+            self._llmod, self._machine, self._ee = compile_orc(
+                split_globals(mod))
+        else:
+            self._llmod, self._machine, self._ee = _compile(mod)
+        self._watch_unloads()
+
+        self._num_partitions = len(partitions)
+        self._bind_partitions()
+
+        self._pool = ThreadPoolExecutor(max(1, len(partitions) - 1))
+
+        self._init_images(roms)
+
+        self._init_constants(constants)
+
+    def _bind_partitions(self):
+        self._step_funcs = list()
+        self._burst_funcs = list()
+        for i in range(self._num_partitions):
+            self._step_funcs.append(self._get_function(f'step@p{i}'))
+            self._burst_funcs.append(self._get_function(f'burst@p{i}'))
+
+        self._sync_func = self._get_function('sync')
+
+    def _unloaded(self, name):
+        if name == 'changes':
+            super()._unloaded(name)
+        else:
+            self._bind_partitions()
+
+    def set_pin_state(self, pin, value):
+        super().set_pin_state(pin, value)
+        self._sync_func()
+
+    def restore(self, snapshot):
+        super().restore(snapshot)
+        self._sync_func()
+
+    def step(self):
+        for func in self._step_funcs:
+            func()
+
+    def burst(self):
+        futures = list(map(self._pool.submit, self._burst_funcs[1:]))
+        self._burst_funcs[0]()
+        wait(futures)
+
+    def close(self):
+        self._pool.shutdown()
+        super().close()
@@ -0,0 +1,171 @@
+import json
+import os
+import struct
+from ctypes import addressof, c_uint64, memmove, string_at
+from multiprocessing import resource_tracker, shared_memory
+from time import perf_counter, sleep
+
+from .simulator import Executor, StateLayout, _mask, slot_size
+
+
+MAGIC = b'MCIRCST1'
+HEADER = struct.Struct('<8sQQQQQ')
+SEQUENCE_OFFSET = 8
+
+_TRACKED = os.name == 'posix'
+_CREATED = set()
+
+
+def _align(size):
+    return (size + 7) // 8 * 8
+
+
+class SharedState:
+    def __init__(self, name, layout: StateLayout, fields):
+        data = json.dumps({'fields': fields, 'arrays': layout.arrays}).encode()
+        layout_offset = HEADER.size
+        state_offset = _align(layout_offset + len(data))
+
+        self.memory = shared_memory.SharedMemory(
+            name, create=True, size=state_offset + layout.size)
+        _CREATED.add(self.memory._name)
+        buf = self.memory.buf
+        HEADER.pack_into(buf, 0, MAGIC, 0, layout_offset, len(data),
+                         state_offset, layout.size)
+        buf[layout_offset:layout_offset + len(data)] = data
+
+        self.sequence = c_uint64.from_buffer(buf, SEQUENCE_OFFSET)
+        self.state = (c_uint64 * (layout.size // 8)).from_buffer(buf, state_offset)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def begin(self):
+        self.sequence.value += 1
+
+    def end(self):
+        self.sequence.value += 1
+
+    def close(self):
+        del self.sequence
+        del self.state
+        self.memory.close()
+        self.memory.unlink()
+        _CREATED.discard(self.memory._name)
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        memory = shared_memory.SharedMemory(name)
+        if _TRACKED and memory._name not in _CREATED:
+            resource_tracker.unregister(memory._name, 'shared_memory')
+        return memory
+
+
+class StateViewer(Executor):
+    def __init__(self, name, timeout=0.05):
+        self.memory = _attach(name)
+        self.timeout = timeout
+        buf = self.memory.buf
+
+        magic, _, layout_offset, layout_size, state_offset, state_size = \
+            HEADER.unpack_from(buf)
+        if magic != MAGIC:
+            self.memory.close()
+            raise ValueError(f'{name} is not a simulation state block')
+
+        data = json.loads(bytes(buf[layout_offset:layout_offset + layout_size]))
+        self.fields = dict(map(lambda p: (p[0], tuple(p[1])), data['fields'].items()))
+        self.arrays = dict(map(lambda p: (p[0], tuple(p[1])), data['arrays'].items()))
+
+        self._sequence = c_uint64.from_buffer(buf, SEQUENCE_OFFSET)
+        self._shared = (c_uint64 * (state_size // 8)).from_buffer(buf, state_offset)
+        self.state = (c_uint64 * (state_size // 8))()
+        self.size = state_size
+        self.sequence = None
+        self.consistent = False
+        self.refresh()
+
+        self._watched = dict()
+        for pin, field in self.fields.items():
+            self._watched.setdefault(field, list()).append(pin)
+        self._shadow = bytes(state_size)
+        self._stamps = dict.fromkeys(self._watched, 0)
+        self._generation = 0
+
+    def refresh(self):
+        deadline = perf_counter() + self.timeout
+        while True:
+            before = self._sequence.value
+            if not before & 1:
+                memmove(self.state, self._shared, self.size)
+                if self._sequence.value == before:
+                    self.sequence = before
+                    self.consistent = True
+                    return True
+            if perf_counter() >= deadline:
+                break
+            sleep(0.0001)
+
+        memmove(self.state, self._shared, self.size)
+        self.sequence = self._sequence.value
+        self.consistent = False
+        return False
+
+    def step(self):
+        self.refresh()
+
+    def burst(self):
+        self.refresh()
+
+    def _get_field(self, pin):
+        if pin not in self.fields:
+            raise KeyError(f'pin {pin} is not observable')
+        return self.fields[pin]
+
+    def get_pin_state(self, pin):
+        offset, width = self._get_field(pin)
+        if width <= 64:
+            return c_uint64.from_buffer(self.state, offset).value & _mask(width)
+        data = string_at(addressof(self.state) + offset, slot_size(width))
+        return int.from_bytes(data, 'little') & _mask(width)
+
+    def set_pin_state(self, pin, value):
+        offset, width = self._get_field(pin)
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            value = int.from_bytes(value, 'little')
+        value &= _mask(width)
+        size = slot_size(width)
+        data = value.to_bytes(size, 'little')
+        memmove(addressof(self._shared) + offset, data, size)
+        memmove(addressof(self.state) + offset, data, size)
+
+    def changed_since(self, token=None):
+        self._generation += 1
+        state = string_at(addressof(self.state), self.size)
+        for offset, width in self._watched:
+            end = offset + slot_size(width)
+            if state[offset:end] != self._shadow[offset:end]:
+                self._stamps[offset, width] = self._generation
+        self._shadow = state
+
+        changed = set()
+        for field, pins in self._watched.items():
+            if token is None or self._stamps[field] > token:
+                changed.update(pins)
+        return self._generation, changed
+
+    @property
+    def cycle(self):
+        return self.get_pin_state('cycle')
+
+    def snapshot(self):
+        return type(self.state).from_buffer_copy(self.state)
+
+    def close(self):
+        del self._sequence
+        del self._shared
+        self.memory.close()
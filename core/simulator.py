@@ -1,77 +1,32 @@
 
-from ctypes import CFUNCTYPE, POINTER, cast, c_ulonglong
-
-import networkx as nx
+from concurrent.futures import ThreadPoolExecutor
+from ctypes import (CFUNCTYPE, addressof, c_char, c_uint64, c_void_p, memmove,
+                    string_at)
+from functools import partial
+from itertools import starmap
+from hashlib import sha256
+from time import perf_counter
 
 import llvmlite.ir as ll
-import llvmlite.binding as llvm
-
-from .descriptors import Adder, Clock, Constant, Not, Gate, Register, Composite, Counter
-
-llvm.initialize()
-llvm.initialize_native_target()
-llvm.initialize_native_asmprinter()
-
-
-def iter_simulation_pins(node: Composite, path='/'):
-    for name in node.graph.nodes:
-        desc = node.get_child(name)
-
-        if isinstance(desc, Composite):
-            yield from iter_simulation_pins(desc, path + name + '/')
-        else:
-            yield from map(lambda p: (path + name + '/' + p[0], p[1], 'in'), desc.all_inputs())
-            yield from map(lambda p: (path + name + '/' + p[0], p[1], 'out'), desc.all_outputs())
-            yield from map(lambda p: (path + name + '/' + p[0], p[1], 'internal'), desc.all_internals())
-
-
-def iter_simulation_connections(node: Composite, path='/'):
-    for name in node.graph.nodes:
-        desc = node.get_child(name)
-
-        if isinstance(desc, Composite):
-            yield from iter_simulation_connections(desc, path + name + '/')
-
-        for conn in node.connections:
-            if conn[0].split('/')[0] != name:
-                continue
-            yield path + conn[0] + '/' + conn[1], path + conn[2] + '/' + conn[3]
-
-
-def iter_simulation_topology(node: Composite, path='/'):
-    for name in nx.dfs_postorder_nodes(node.graph):
-        desc = node.get_child(name)
-
-        if isinstance(desc, Composite):
-            yield from iter_simulation_topology(desc, path + name + '/')
-        else:
-            yield 'emit', (desc, path + name + '/')
-
-        for conn in node.connections:
-            if conn[0].split('/')[0] != name:
-                continue
-            yield 'propagate', (path + conn[0] + '/' + conn[1], path + conn[2] + '/' + conn[3])
 
+from .descriptors import (RAM, ROM, Adder, Clock, Constant, Not, Gate, Register,
+                          Composite, Counter)
+from .netlist import (Netlist, iter_simulation_memories, iter_simulation_pins,
+                      iter_simulation_topology)
+from .optimizer import optimize
 
-def _map_to_sources(desc: Composite):
-    conns = dict()
-    for src, dest in iter_simulation_connections(desc):
-        conns[dest] = src
+_llvm = None
 
-    def _trace_pin(path):
-        curr = path
-        if curr not in conns:
-            return None
-        while curr in conns:
-            curr = conns[curr]
-        return curr
 
-    traces = dict()
-
-    for pin, _, _ in iter_simulation_pins(desc):
-        traces[pin] = _trace_pin(pin)
-
-    return traces
+def _load_llvm():
+    global _llvm
+    if _llvm is None:
+        import llvmlite.binding as llvm
+        llvm.initialize()
+        llvm.initialize_native_target()
+        llvm.initialize_native_asmprinter()
+        _llvm = llvm
+    return _llvm
 
 
 def _translate_not(b: ll.IRBuilder, desc: Gate, path, get_global):
@@ -97,39 +52,49 @@ def _translate_gate(b: ll.IRBuilder, desc: Gate, path, get_global):
     b.store(res, get_global(path, 'out'))
 
 
-def _translate_counter(b: ll.IRBuilder, desc: Counter, path, get_global):
-    prevclk = get_global(path, 'prevclock')
+def _update_counter(b: ll.IRBuilder, desc: Counter, path, get_global):
     out = get_global(path, 'out')
-    clk = get_global(path, 'clock')
+    b.store(b.add(b.load(out), ll.Constant(ll.IntType(desc.width), 1)), out)
 
-    itype = ll.IntType(desc.width)
-    v1 = b.load(prevclk)
-    v2 = b.load(clk)
-    v3 = b.zext(b.and_(b.not_(v1), v2), itype)
 
-    b.store(b.or_(b.and_(v3, b.add(b.load(out), ll.Constant(itype, 1))),
-            b.and_(b.not_(v3), b.load(out))), out)
-    b.store(b.load(clk), prevclk)
+def _update_register(b: ll.IRBuilder, desc: Register, path, get_global):
+    b.store(b.load(get_global(path, 'data')), get_global(path, 'out'))
 
 
-def _translate_register(b: ll.IRBuilder, desc: Counter, path, get_global):
-    prevclk = get_global(path, 'prevclock')
-    data = get_global(path, 'data')
-    out = get_global(path, 'out')
-    clk = get_global(path, 'clock')
+def _translate_edge(b: ll.IRBuilder, path, get_global):
+    prevclk = b.load(get_global(path, 'prevclock'))
+    clk = b.load(get_global(path, 'clock'))
+    return b.and_(b.not_(prevclk), clk)
+
+
+def _translate_clocked(b: ll.IRBuilder, desc, path, get_global, edge=None, emit_cone=None):
+    clk = b.load(get_global(path, 'clock'))
+    if edge is None:
+        edge = _translate_edge(b, path, get_global)
 
-    v1 = b.load(prevclk)
-    v2 = b.load(clk)
-    v3 = b.and_(b.not_(v1), v2)
+    with b.if_then(edge):
+        if emit_cone is not None:
+            emit_cone()
+        CLOCKED_UPDATE[type(desc)](b, desc, path, get_global)
 
-    b.store(b.or_(b.and_(v3, b.load(data)),
-            b.and_(b.not_(v3), out)), out)
-    b.store(b.load(clk), prevclk)
+    b.store(clk, get_global(path, 'prevclock'))
+
+
+def _clock_phase(b: ll.IRBuilder, desc: Clock, out):
+    int_type = ll.IntType(64)
+    return b.select(out, ll.Constant(int_type, max(1, desc.short)),
+                    ll.Constant(int_type, max(1, desc.long)))
 
 
 def _translate_clock(b: ll.IRBuilder, desc: Clock, path, get_global):
     out = get_global(path, 'out')
-    b.store(b.not_(b.load(out)), out)
+    count = get_global(path, 'count')
+
+    v = b.load(out)
+    n = b.add(b.load(count), ll.Constant(ll.IntType(64), 1))
+    toggle = b.icmp_unsigned('>=', n, _clock_phase(b, desc, v))
+    b.store(b.xor(v, toggle), out)
+    b.store(b.select(toggle, ll.Constant(n.type, 0), n), count)
 
 
 def _translate_adder(b: ll.IRBuilder, desc: Adder, path, get_global):
@@ -139,24 +104,471 @@ def _translate_adder(b: ll.IRBuilder, desc: Adder, path, get_global):
     sum_ = get_global(path, 'sum')
     cout = get_global(path, 'cout')
 
-    s1 = b.sadd_with_overflow(b.load(a_), b.load(b_))
-    s2 = b.sadd_with_overflow(
+    s1 = b.uadd_with_overflow(b.load(a_), b.load(b_))
+    s2 = b.uadd_with_overflow(
         b.extract_value(s1, 0), b.zext(b.load(cin), ll.IntType(desc.width)))
     b.store(b.extract_value(s2, 0), sum_)
     b.store(b.or_(b.extract_value(s1, 1),
             b.extract_value(s2, 1)), cout)
 
 
+def _resize(b: ll.IRBuilder, v, width):
+    if v.type.width < width:
+        return b.zext(v, ll.IntType(width))
+    if v.type.width > width:
+        return b.trunc(v, ll.IntType(width))
+    return v
+
+
+def _memory_slot(b: ll.IRBuilder, memory, path, get_global):
+    address = _resize(b, b.load(get_global(path, 'address')), 64)
+    return b.gep(memory, (ll.Constant(ll.IntType(64), 0), address), inbounds=True)
+
+
+def _update_ram(b: ll.IRBuilder, desc: RAM, path, get_global):
+    slot = _memory_slot(b, get_global(path, 'memory'), path, get_global)
+    with b.if_then(b.load(get_global(path, 'write'))):
+        data = b.load(get_global(path, 'data'))
+        b.store(_resize(b, data, slot.type.pointee.width), slot)
+    b.store(_resize(b, b.load(slot), desc.data_width), get_global(path, 'out'))
+
+
+def _translate_rom(b: ll.IRBuilder, desc: ROM, path, get_global):
+    name = 'rom@' + path
+    image = b.module.globals.get(name)
+    if image is None:
+        array_type = memory_type(desc.data_width, 1 << desc.address_width)
+        image = ll.GlobalVariable(b.module, array_type.as_pointer(), name)
+        image.initializer = ll.Constant(array_type.as_pointer(), None)
+
+    slot = _memory_slot(b, b.load(image), path, get_global)
+    b.store(_resize(b, b.load(slot), desc.data_width), get_global(path, 'out'))
+
+
+def _translate_constant(b: ll.IRBuilder, desc: Constant, path, get_global):
+    b.store(ll.Constant(ll.IntType(desc.width), desc.value & _mask(desc.width)),
+            get_global(path, 'out'))
+
+
 TRANSLATOR = {
+    Constant: _translate_constant,
     Gate: _translate_gate,
     Adder: _translate_adder,
     Clock: _translate_clock,
     Not: _translate_not,
-    Register: _translate_register,
-    Counter: _translate_counter
+    Register: _translate_clocked,
+    Counter: _translate_clocked,
+    RAM: _translate_clocked,
+    ROM: _translate_rom
+}
+
+CLOCKED_UPDATE = {
+    Register: _update_register,
+    Counter: _update_counter,
+    RAM: _update_ram
 }
 
 
+
+STATE_TYPE = ll.IntType(8).as_pointer()
+SHARED_RUN_CHUNK = 1 << 16
+
+
+class StateLayout:
+    def __init__(self):
+        self.fields = dict()
+        self.arrays = dict()
+        self.size = 0
+
+    def add(self, path, width, count=1):
+        offset = self.size
+        self.fields[path] = offset, width
+        self.size += slot_size(width) * count
+        return offset
+
+    def add_array(self, path, width, count):
+        offset = self.size
+        self.arrays[path] = offset, width, count
+        self.size += (element_size(width) * count + 7) // 8 * 8
+        return offset
+
+    def pointer(self, b: ll.IRBuilder, state, path, index=None):
+        if path in self.arrays:
+            offset, width, count = self.arrays[path]
+            p = b.gep(state, (ll.Constant(ll.IntType(64), offset),), inbounds=True)
+            return b.bitcast(p, memory_type(width, count).as_pointer())
+
+        offset, width = self.fields[path]
+        offset = ll.Constant(ll.IntType(64), offset)
+        if index is not None:
+            index = b.mul(index, ll.Constant(index.type, slot_size(width)))
+            offset = b.add(offset, index)
+        p = b.gep(state, (offset,), inbounds=True)
+        return b.bitcast(p, ll.IntType(width).as_pointer())
+
+
+def slot_size(width):
+    return (width + 63) // 64 * 8
+
+
+def element_size(width):
+    if width > 64:
+        return slot_size(width)
+    return 1 << max(0, (width - 1).bit_length() - 3)
+
+
+def memory_type(width, count):
+    return ll.ArrayType(ll.IntType(element_size(width) * 8), count)
+
+
+def _mask(width):
+    return (1 << width) - 1
+
+
+def _emit_burst(mod: ll.Module, name, body, burst_size):
+    int_type = ll.IntType(64)
+    func_type = ll.FunctionType(ll.VoidType(), (STATE_TYPE,))
+
+    burst_func = ll.Function(mod, func_type, name=name)
+    b_entry = burst_func.append_basic_block()
+    b_loop = burst_func.append_basic_block()
+    b_exit = burst_func.append_basic_block()
+    b = ll.IRBuilder()
+
+    b.position_at_end(b_entry)
+    cnt_p = b.alloca(int_type)
+    b.store(ll.Constant(int_type, burst_size), cnt_p)
+    b.branch(b_loop)
+
+    b.position_at_end(b_loop)
+    for func in body:
+        b.call(func, burst_func.args[:len(func.args)])
+    cnt = b.load(cnt_p)
+    v = b.sub(cnt, ll.Constant(int_type, 1))
+    b.store(v, cnt_p)
+    cond = b.icmp_unsigned('!=', cnt, ll.Constant(int_type, 0))
+    b.cbranch(cond, b_loop, b_exit)
+
+    b.position_at_end(b_exit)
+    b.ret_void()
+
+    return burst_func
+
+
+def _fields_end(layout: StateLayout):
+    return min(map(lambda array: array[0], layout.arrays.values()),
+               default=layout.size)
+
+
+def _emit_run(mod: ll.Module, name, step_func, layout: StateLayout, clocks, start):
+    int_type = ll.IntType(64)
+    byte_ptr = ll.IntType(8).as_pointer()
+    func_type = ll.FunctionType(ll.VoidType(), (STATE_TYPE, int_type, byte_ptr))
+    memcpy = mod.declare_intrinsic('llvm.memcpy', [byte_ptr, byte_ptr, int_type])
+    memcmp = ll.Function(mod, ll.FunctionType(
+        ll.IntType(32), (byte_ptr, byte_ptr, int_type)), name='memcmp')
+
+    run_func = ll.Function(mod, func_type, name=name)
+    state, cycles, shadow = run_func.args
+    b_entry = run_func.append_basic_block()
+    b_loop = run_func.append_basic_block()
+    b_body = run_func.append_basic_block()
+    b_hold = run_func.append_basic_block()
+    b_check = run_func.append_basic_block()
+    b_step = run_func.append_basic_block()
+    b_probe = run_func.append_basic_block()
+    b_busy = run_func.append_basic_block()
+    b_skip = run_func.append_basic_block()
+    b_exit = run_func.append_basic_block()
+    b = ll.IRBuilder()
+
+    size = ll.Constant(int_type, _fields_end(layout) - start)
+    zero = ll.Constant(int_type, 0)
+    one = ll.Constant(int_type, 1)
+
+    b.position_at_end(b_entry)
+    remaining_p = b.alloca(int_type)
+    hold_p = b.alloca(int_type)
+    b.store(cycles, remaining_p)
+    b.store(zero, hold_p)
+    b.branch(b_loop)
+
+    b.position_at_end(b_loop)
+    remaining = b.load(remaining_p)
+    b.cbranch(b.icmp_unsigned('==', remaining, ll.Constant(int_type, 0)),
+              b_exit, b_body)
+
+    b.position_at_end(b_body)
+    hold = b.load(hold_p)
+    b.cbranch(b.icmp_unsigned('==', hold, zero), b_check, b_hold)
+
+    b.position_at_end(b_hold)
+    b.store(b.sub(hold, one), hold_p)
+    b.branch(b_step)
+
+    b.position_at_end(b_check)
+    distance = ll.Constant(int_type, -1)
+    for desc, path in clocks:
+        out = b.load(layout.pointer(b, state, path + 'out'))
+        count = b.load(layout.pointer(b, state, path + 'count'))
+        d = b.sub(_clock_phase(b, desc, out), count)
+        distance = b.select(b.icmp_unsigned('<', d, distance), d, distance)
+    idle = b.and_(b.icmp_unsigned('>', distance, one),
+                  b.icmp_unsigned('>', remaining, one))
+    b.cbranch(idle, b_probe, b_step)
+
+    b.position_at_end(b_step)
+    b.call(step_func, (state,))
+    b.store(b.sub(remaining, one), remaining_p)
+    b.branch(b_loop)
+
+    b.position_at_end(b_probe)
+    data = b.gep(state, (ll.Constant(int_type, start),), inbounds=True)
+    b.call(memcpy, (shadow, data, size, ll.Constant(ll.IntType(1), 0)))
+    b.call(step_func, (state,))
+    remaining = b.sub(remaining, one)
+    b.store(remaining, remaining_p)
+    same = b.call(memcmp, (shadow, data, size))
+    b.cbranch(b.icmp_signed('==', same, ll.Constant(same.type, 0)),
+              b_skip, b_busy)
+
+    b.position_at_end(b_busy)
+    b.store(b.sub(distance, one), hold_p)
+    b.branch(b_loop)
+
+    b.position_at_end(b_skip)
+    n = b.sub(distance, ll.Constant(int_type, 2))
+    n = b.select(b.icmp_unsigned('<', n, remaining), n, remaining)
+    for _, path in clocks:
+        count = layout.pointer(b, state, path + 'count')
+        b.store(b.add(b.load(count), n), count)
+    cycle = layout.pointer(b, state, 'cycle')
+    b.store(b.add(b.load(cycle), n), cycle)
+    b.store(b.sub(remaining, n), remaining_p)
+    b.branch(b_loop)
+
+    b.position_at_end(b_exit)
+    b.ret_void()
+
+    return run_func
+
+
+def _emit_testbench(mod: ll.Module, name, step_func):
+    int_type = ll.IntType(64)
+    int_ptr = int_type.as_pointer()
+    func_type = ll.FunctionType(
+        ll.VoidType(), (STATE_TYPE, int_ptr, int_ptr, int_type, int_ptr))
+
+    func = ll.Function(mod, func_type, name=name)
+    state, inputs, outputs, cycles, table = func.args
+    b_entry = func.append_basic_block()
+    b_cycle = func.append_basic_block()
+    b_inputs = func.append_basic_block()
+    b_input = func.append_basic_block()
+    b_step = func.append_basic_block()
+    b_outputs = func.append_basic_block()
+    b_output = func.append_basic_block()
+    b_next = func.append_basic_block()
+    b_exit = func.append_basic_block()
+    b = ll.IRBuilder()
+
+    zero = ll.Constant(int_type, 0)
+    one = ll.Constant(int_type, 1)
+    two = ll.Constant(int_type, 2)
+
+    def entry(index):
+        return b.load(b.gep(table, (index,), inbounds=True))
+
+    def field(index):
+        offset = entry(b.add(b.mul(index, two), two))
+        mask = entry(b.add(b.mul(index, two), ll.Constant(int_type, 3)))
+        p = b.gep(state, (offset,), inbounds=True)
+        return b.bitcast(p, int_ptr), mask
+
+    b.position_at_end(b_entry)
+    c_p = b.alloca(int_type)
+    i_p = b.alloca(int_type)
+    num_inputs = entry(zero)
+    num_outputs = entry(one)
+    b.store(zero, c_p)
+    b.branch(b_cycle)
+
+    b.position_at_end(b_cycle)
+    c = b.load(c_p)
+    b.store(zero, i_p)
+    b.cbranch(b.icmp_unsigned('==', c, cycles), b_exit, b_inputs)
+
+    b.position_at_end(b_inputs)
+    i = b.load(i_p)
+    b.cbranch(b.icmp_unsigned('==', i, num_inputs), b_step, b_input)
+
+    b.position_at_end(b_input)
+    p, mask = field(i)
+    row = b.gep(inputs, (b.add(b.mul(c, num_inputs), i),), inbounds=True)
+    b.store(b.and_(b.load(row), mask), p)
+    b.store(b.add(i, one), i_p)
+    b.branch(b_inputs)
+
+    b.position_at_end(b_step)
+    b.call(step_func, (state,))
+    b.store(zero, i_p)
+    b.branch(b_outputs)
+
+    b.position_at_end(b_outputs)
+    i = b.load(i_p)
+    b.cbranch(b.icmp_unsigned('==', i, num_outputs), b_next, b_output)
+
+    b.position_at_end(b_output)
+    p, mask = field(b.add(i, num_inputs))
+    row = b.gep(outputs, (b.add(b.mul(c, num_outputs), i),), inbounds=True)
+    b.store(b.and_(b.load(p), mask), row)
+    b.store(b.add(i, one), i_p)
+    b.branch(b_outputs)
+
+    b.position_at_end(b_next)
+    b.store(b.add(c, one), c_p)
+    b.branch(b_cycle)
+
+    b.position_at_end(b_exit)
+    b.ret_void()
+
+    return func
+
+
+def _emit_changes(mod: ll.Module, name):
+    int_type = ll.IntType(64)
+    int_ptr = int_type.as_pointer()
+    func_type = ll.FunctionType(
+        ll.VoidType(), (STATE_TYPE, int_ptr, int_ptr, int_type, int_ptr, int_type))
+
+    func = ll.Function(mod, func_type, name=name)
+    state, shadow, table, count, stamps, generation = func.args
+    b_entry = func.append_basic_block()
+    b_loop = func.append_basic_block()
+    b_body = func.append_basic_block()
+    b_changed = func.append_basic_block()
+    b_next = func.append_basic_block()
+    b_exit = func.append_basic_block()
+    b = ll.IRBuilder()
+
+    one = ll.Constant(int_type, 1)
+
+    b.position_at_end(b_entry)
+    k_p = b.alloca(int_type)
+    b.store(ll.Constant(int_type, 0), k_p)
+    words = b.bitcast(state, int_ptr)
+    b.branch(b_loop)
+
+    b.position_at_end(b_loop)
+    k = b.load(k_p)
+    b.cbranch(b.icmp_unsigned('==', k, count), b_exit, b_body)
+
+    b.position_at_end(b_body)
+    entry = b.shl(k, one)
+    word = b.load(b.gep(table, (entry,), inbounds=True))
+    field = b.load(b.gep(table, (b.add(entry, one),), inbounds=True))
+    value = b.load(b.gep(words, (word,), inbounds=True))
+    old_p = b.gep(shadow, (k,), inbounds=True)
+    b.cbranch(b.icmp_unsigned('!=', value, b.load(old_p)), b_changed, b_next)
+
+    b.position_at_end(b_changed)
+    b.store(value, old_p)
+    b.store(generation, b.gep(stamps, (field,), inbounds=True))
+    b.branch(b_next)
+
+    b.position_at_end(b_next)
+    b.store(b.add(k, one), k_p)
+    b.branch(b_loop)
+
+    b.position_at_end(b_exit)
+    b.ret_void()
+
+    return func
+
+
+def _emit_step(mod: ll.Module, name):
+    func_type = ll.FunctionType(ll.VoidType(), (STATE_TYPE,))
+    step_func = ll.Function(mod, func_type, name=name)
+    step_func.args[0].add_attribute('noalias')
+    return step_func
+
+
+def _compile(mod, opt_level=3, context=None):
+    llvm = _load_llvm()
+    llmod = llvm.parse_assembly(str(mod), context)
+
+    if opt_level > 0:
+        pmb = llvm.create_pass_manager_builder()
+        pmb.inlining_threshold = 10000000
+        pmb.opt_level = opt_level
+        pm = llvm.create_module_pass_manager()
+        pmb.populate(pm)
+        pm.run(llmod)
+
+    # print(llmod,
+    #       file=open('out.txt', 'w'), flush=True)
+
+    machine = llvm.Target.from_default_triple().create_target_machine(
+        opt=opt_level)
+
+    ee = llvm.create_mcjit_compiler(llmod, machine)
+    ee.finalize_object()
+
+    return llmod, machine, ee
+
+
+def _emit_netlist(b: ll.IRBuilder, netlist: Netlist, get_global, widths,
+                  include=None):
+    cells = list(enumerate(netlist.cells))
+    if include is not None:
+        cells = list(filter(lambda cell: cell[0] in include, cells))
+
+    constants = netlist.constants
+    used = set()
+    for _, (desc, path) in cells:
+        used.update(map(lambda p: p[0], netlist.iter_inputs(desc, path)))
+    for net in filter(lambda net: net in used, constants):
+        b.store(ll.Constant(ll.IntType(widths[net]), constants[net]),
+                get_global(net, ''))
+
+    def get_pin(path, pin):
+        return get_global(netlist.pin(path, pin), '')
+
+    domains = netlist.clock_domains
+    gated = set(domains.gated())
+    edges = dict()
+
+    def emit_cell(desc, path):
+        TRANSLATOR[type(desc)](b, desc, path, get_pin)
+
+    for i, (desc, path) in cells:
+        if i in gated:
+            continue
+        if type(desc) not in CLOCKED_UPDATE:
+            emit_cell(desc, path)
+            continue
+
+        clock = netlist.pin(path, 'clock')
+        edge = None
+        if clock in domains.stable:
+            if clock not in edges:
+                edges[clock] = _translate_edge(b, path, get_pin)
+            edge = edges[clock]
+
+        cone = list(map(lambda j: netlist.cells[j], domains.cones[i]))
+        _translate_clocked(b, desc, path, get_pin, edge,
+                           lambda cone=cone: list(starmap(emit_cell, cone)))
+
+
+def _hash_circuit(layout: StateLayout, step_funcs):
+    h = sha256()
+    h.update(repr(sorted(layout.fields.items())).encode())
+    h.update(repr(sorted(layout.arrays.items())).encode())
+    for func in step_funcs:
+        h.update(str(func).encode())
+    return h.hexdigest()
+
+
 class Executor:
     def get_pin_state(self, pin):
         raise NotImplementedError
@@ -170,128 +582,502 @@ class Executor:
     def burst(self):
         raise NotImplementedError
 
+    def snapshot(self):
+        raise NotImplementedError
+
+    def restore(self, snapshot):
+        raise NotImplementedError
+
+    def reset(self):
+        raise NotImplementedError
+
+    def run(self, cycles):
+        raise NotImplementedError
+
+    def run_vectors(self, stimulus, inputs, outputs, out=None):
+        raise NotImplementedError
+
+    def changed_since(self, token=None):
+        raise NotImplementedError
+
+    def get_memory(self, path):
+        raise NotImplementedError
+
+    def set_image(self, path, buffer):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _compile_background(ir, opt_level):
+    return _compile(ir, opt_level, _load_llvm().create_context())
 
-class JIT(Executor):
-    def __init__(self, root: Composite, burst_size, map_pins):
+
+class _Image:
+    def __init__(self, name, width, count):
+        self.name = name
+        self.pointer = None
+        self.width = width
+        self.count = count
+        self.buffer = None
+
+
+class CompiledExecutor(Executor):
+    shared = None
+    _change_table = None
+    _changes_func = None
+
+    def _init_state(self, layout: StateLayout, step_funcs, shared=None):
+        self.layout = layout
+        self.circuit_hash = _hash_circuit(layout, step_funcs)
+        if shared is None:
+            self.state = (c_uint64 * (layout.size // 8))()
+        else:
+            from .shared import SharedState
+            self.shared = SharedState(shared, layout, self._published_fields(layout))
+            self.state = self.shared.state
+        self._state_ptr = addressof(self.state)
+
+    def _published_fields(self, layout: StateLayout):
+        fields = dict(layout.fields)
+        for pin in self._pin_map or ():
+            path = self._get_source_path(pin)
+            if path in layout.fields:
+                fields[pin] = layout.fields[path]
+        return fields
+
+    def _get_function(self, name, *argtypes):
+        ptr = self._ee.get_function_address(name)
+        func = CFUNCTYPE(None, c_void_p, *argtypes)(ptr)
+        return partial(func, self._state_ptr)
+
+    def _watch_unloads(self):
+        listeners = getattr(self._ee, 'listeners', None)
+        if listeners is not None and self._unloaded not in listeners:
+            listeners.append(self._unloaded)
+
+    def _unloaded(self, name):
+        setattr(self, f'_{name}_func', None)
+
+    def _get_source_path(self, path):
+        if self._pin_map is None:
+            return path
+        if self._pin_map.get(path) is None:
+            return path
+        return self._pin_map[path]
+
+    def _get_field(self, pin):
+        path = self._get_source_path(pin)
+        if path not in self.layout.fields:
+            raise KeyError(f'pin {pin} is not observable')
+        return self.layout.fields[path]
+
+    def get_pin_state(self, pin):
+        offset, width = self._get_field(pin)
+        if width <= 64:
+            return c_uint64.from_buffer(self.state, offset).value & _mask(width)
+        return int.from_bytes(self.get_pin_bytes(pin), 'little')
+
+    def set_pin_state(self, pin, value):
+        offset, width = self._get_field(pin)
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            value = int.from_bytes(value, 'little')
+        value &= _mask(width)
+        if self.shared is not None:
+            self.shared.begin()
+        if width <= 64:
+            c_uint64.from_buffer(self.state, offset).value = value
+        else:
+            size = slot_size(width)
+            memmove(self._state_ptr + offset, value.to_bytes(size, 'little'), size)
+        if self.shared is not None:
+            self.shared.end()
+
+    def get_pin_bytes(self, pin):
+        offset, width = self._get_field(pin)
+        data = bytearray(string_at(self._state_ptr + offset, (width + 7) // 8))
+        if width % 8:
+            data[-1] &= _mask(width % 8)
+        return bytes(data)
+
+    def get_pin_array(self, pin):
+        import numpy as np
+
+        offset, width = self._get_field(pin)
+        return np.frombuffer(self.state, np.uint64, slot_size(width) // 8, offset)
+
+    @property
+    def cycle(self):
+        return self.get_pin_state('cycle')
+
+    def _init_changes(self):
+        import numpy as np
+
+        fields = dict()
+        for pin, field in self._published_fields(self.layout).items():
+            fields.setdefault(field, list()).append(pin)
+        self._watched = list(fields.values())
+
+        table = list()
+        for i, (offset, width) in enumerate(fields):
+            for k in range(slot_size(width) // 8):
+                table.extend((offset // 8 + k, i))
+        self._change_table = np.array(table, np.uint64)
+        self._shadow = np.zeros(len(table) // 2, np.uint64)
+        self._stamps = np.zeros(len(fields), np.uint64)
+        self._generation = 0
+
+    def changed_since(self, token=None):
+        import numpy as np
+
+        if self._change_table is None:
+            self._init_changes()
+        if self._changes_func is None:
+            self._changes_func = self._get_function(
+                'changes', c_void_p, c_void_p, c_uint64, c_void_p, c_uint64)
+
+        self._generation += 1
+        self._changes_func(self._shadow.ctypes.data, self._change_table.ctypes.data,
+                           len(self._shadow), self._stamps.ctypes.data,
+                           self._generation)
+
+        if token is None:
+            indices = range(len(self._watched))
+        else:
+            indices = np.flatnonzero(self._stamps > np.uint64(token))
+
+        changed = set()
+        for i in indices:
+            changed.update(self._watched[i])
+        return self._generation, changed
+
+    def snapshot(self):
+        return type(self.state).from_buffer_copy(self.state)
+
+    def restore(self, snapshot):
+        if memoryview(snapshot).nbytes != self.layout.size:
+            raise ValueError('snapshot does not match the state layout')
+        if self.shared is not None:
+            self.shared.begin()
+        memmove(self._state_ptr, snapshot, self.layout.size)
+        if self.shared is not None:
+            self.shared.end()
+
+    def _init_constants(self, constants):
+        for net, value in constants.items():
+            if net in self.layout.fields:
+                self.set_pin_state(net, value)
+        self._initial_state = self.snapshot()
+
+    def reset(self):
+        self.restore(self._initial_state)
+
+    def _init_images(self, roms):
+        self._images = dict()
+        for desc, path in roms:
+            name = 'rom@' + path
+            if name not in self._module.globals:
+                continue
+            image = _Image(name, desc.data_width, 1 << desc.address_width)
+            self._images[path + 'memory'] = image
+            self._bind_image(image)
+            self.set_image(path + 'memory', (c_char * (
+                element_size(image.width) * image.count))())
+
+    def _bind_image(self, image: _Image):
+        image.pointer = c_void_p.from_address(
+            self._ee.get_global_value_address(image.name))
+        if image.buffer is not None:
+            image.pointer.value = addressof(image.buffer)
+
+    def is_rom(self, path):
+        return path in self._images
+
+    def get_memory(self, path):
+        if path in self.layout.arrays:
+            offset, width, count = self.layout.arrays[path]
+            size = element_size(width) * count
+            return (c_char * size).from_buffer(self.state, offset), width, count
+        if path in self._images:
+            image = self._images[path]
+            return image.buffer, image.width, image.count
+        raise KeyError(f'{path} is not a memory')
+
+    def set_image(self, path, buffer):
+        if path not in self._images:
+            raise KeyError(f'{path} is not a ROM')
+        image = self._images[path]
+        if len(buffer) < element_size(image.width) * image.count:
+            raise ValueError('image is smaller than the ROM')
+        image.pointer.value = addressof(buffer)
+        image.buffer = buffer
+
+
+class JIT(CompiledExecutor):
+    def __init__(self, root: Composite, burst_size, map_pins, observed=None,
+                 tiered=False, backend='mcjit', shared=None):
         self.root = root
 
         mod = self._module = ll.Module()
 
         if map_pins:
-            self._pin_map = _map_to_sources(root)
+            netlist = Netlist(root)
+            self.report = optimize(netlist, observed)
+            self._pin_map = netlist.pin_map
+            constants = netlist.constants
         else:
+            self.report = None
             self._pin_map = None
+            constants = dict()
+
+        if map_pins:
+            cells = netlist.cells
+        else:
+            cells = map(lambda op: op[1], filter(
+                lambda op: op[0] == 'emit', iter_simulation_topology(root)))
+        cells = list(cells)
+        clocks = list(filter(lambda cell: type(cell[0]) is Clock, cells))
+        roms = list(filter(lambda cell: type(cell[0]) is ROM, cells))
+
+        layout = StateLayout()
+        layout.add('cycle', 64)
+        for _, path in clocks:
+            layout.add(path + 'count', 64)
+        start = layout.size
+
+        internal = self.report.internal if map_pins else set()
+        widths = dict()
 
         for pin_path, pin_width, tp in iter_simulation_pins(root):
+            widths[pin_path] = pin_width
             if map_pins and self._pin_map[pin_path] is not None:
                 continue
-            pin_type = ll.IntType(pin_width)
-            var = ll.GlobalVariable(mod, pin_type, pin_path)
-            var.initializer = ll.Constant(pin_type, 0)
-            var.align = 8
+            if pin_path in internal or pin_path in layout.fields:
+                continue
+            layout.add(pin_path, pin_width)
 
-        int_type = ll.IntType(64)
+        for path, width, count in iter_simulation_memories(root):
+            layout.add_array(path, width, count)
 
-        func_type = ll.FunctionType(ll.VoidType(), tuple())
-        step_func = ll.Function(mod, func_type, name='step')
+        step_func = _emit_step(mod, 'step')
+        state = step_func.args[0]
 
-        b_entry = step_func.append_basic_block()
+        b_locals = step_func.append_basic_block('locals')
+        b_entry = step_func.append_basic_block('entry')
         b = ll.IRBuilder(b_entry)
-
-        constants = list()
+        b_alloca = ll.IRBuilder(b_locals)
+        local_nets = dict()
 
         def get_global_at(path):
-            return mod.get_global(self._get_source_path(path))
+            path = self._get_source_path(path)
+            if path not in internal:
+                return layout.pointer(b, state, path)
+            if path not in local_nets:
+                local_nets[path] = b_alloca.alloca(
+                    ll.IntType(widths[path]), name=path)
+            return local_nets[path]
 
         def get_global(desc, pin):
             return get_global_at(desc + pin)
 
-        for op, data in iter_simulation_topology(root):
-            if op == 'propagate':
-                path1, path2 = data
-                v = b.load(get_global_at(path1))
-                b.store(v, get_global_at(path2))
-            else:
-                desc = data[0]
-                path = data[1]
-                tp = type(desc)
-                if tp in TRANSLATOR:
-                    TRANSLATOR[tp](b, desc, path, get_global)
-                elif tp is Constant:
-                    constants.append(data)
-
+        if map_pins:
+            _emit_netlist(b, netlist, get_global, widths)
+        else:
+            for op, data in iter_simulation_topology(root):
+                if op == 'propagate':
+                    path1, path2 = data
+                    v = b.load(get_global_at(path1))
+                    b.store(v, get_global_at(path2))
+                else:
+                    desc = data[0]
+                    path = data[1]
+                    tp = type(desc)
+                    if tp in TRANSLATOR:
+                        TRANSLATOR[tp](b, desc, path, get_global)
+                    if tp is Constant:
+                        constants[path + 'out'] = desc.value
+
+        cycle = layout.pointer(b, state, 'cycle')
+        b.store(b.add(b.load(cycle), ll.Constant(ll.IntType(64), 1)), cycle)
         b.ret_void()
 
-        burst_func = ll.Function(mod, func_type, name='burst')
-        b_entry = burst_func.append_basic_block()
-        b_loop = burst_func.append_basic_block()
-        b_exit = burst_func.append_basic_block()
-        b = ll.IRBuilder()
-
-        b.position_at_end(b_entry)
-        cnt_p = b.alloca(int_type)
-        b.store(ll.Constant(int_type, burst_size), cnt_p)
-        b.branch(b_loop)
-
-        b.position_at_end(b_loop)
-        b.call(step_func, tuple())
-        cnt = b.load(cnt_p)
-        v = b.sub(cnt, ll.Constant(int_type, 1))
-        b.store(v, cnt_p)
-        cond = b.icmp_unsigned('!=', cnt, ll.Constant(int_type, 0))
-        b.cbranch(cond, b_loop, b_exit)
-
-        b.position_at_end(b_exit)
-        b.ret_void()
+        b_alloca.branch(b_entry)
 
-        llmod = self._llmod = llvm.parse_assembly(str(mod))
+        _emit_burst(mod, 'burst', (step_func,), burst_size)
+        _emit_run(mod, 'run', step_func, layout, clocks, start)
+        _emit_testbench(mod, 'testbench', step_func)
+        _emit_changes(mod, 'changes')
 
         #print(str(mod), file=open('out.txt', 'w'))
 
-        pmb = llvm.create_pass_manager_builder()
-        pmb.inlining_threshold = 10000000
-        pmb.opt_level = 3
-        pm = llvm.create_module_pass_manager()
-        pmb.populate(pm)
-        pm.run(llmod)
+        self._init_state(layout, (step_func,), shared)
 
-        # print(llmod,
-        #       file=open('out.txt', 'w'), flush=True)
+        if backend == 'orc':
+            from .orc import compile_orc, split_globals
+            self._ir = split_globals(mod)
+            self._compile = self._compile_background = compile_orc
+        else:
+            self._ir = str(mod)
+            self._compile = _compile
+            self._compile_background = _compile_background
 
-        self._machine = llvm.Target.from_default_triple().create_target_machine(opt=3)
+        self._run_start = start
+        self._run_shadow = None
 
-        self._ee = llvm.create_mcjit_compiler(llmod, self._machine)
-        self._ee.finalize_object()
+        self._tiering = tiered
+        self._compiler = None
+        self._pending = None
+        self._busy = 0
+        self._steps = 0
 
-        print(self._machine.emit_assembly(llmod),
-              file=open('out.txt', 'w'), flush=True)
+        a = perf_counter()
+        self.tier = 0 if tiered else 3
+        self._load(self._compile(self._ir, self.tier))
+        self._compile_time = perf_counter() - a
 
-        ptr = self._ee.get_function_address('step')
-        self._step_func = CFUNCTYPE(None)(ptr)
+        self._init_images(roms)
 
-        ptr = self._ee.get_function_address('burst')
-        self._burst_func = CFUNCTYPE(None)(ptr)
+        self._init_constants(constants)
 
-        for desc, path in constants:
-            self.set_pin_state(path + 'out', desc.value)
+    def _load(self, compiled):
+        self._llmod, self._machine, self._ee = compiled
+        self._watch_unloads()
 
-    def _get_source_path(self, path):
-        if self._pin_map is None:
-            return path
-        if self._pin_map[path] is None:
-            return path
-        return self._pin_map[path]
+        self._step_func = self._get_function('step')
+        self._burst_func = None
+        self._run_func = None
+        self._testbench_func = None
+        self._changes_func = None
 
-    def get_pin_state(self, pin):
-        ptr = self._ee.get_global_value_address(self._get_source_path(pin))
-        return cast(ptr, POINTER(c_ulonglong))[0]
+    def _unloaded(self, name):
+        if name == 'step':
+            self._step_func = self._get_function('step')
+        else:
+            super()._unloaded(name)
+
+    def close(self):
+        if self.shared is None:
+            return
+
+        shared, self.shared = self.shared, None
+        self.state = self.snapshot()
+        self._state_ptr = addressof(self.state)
+        self._load((self._llmod, self._machine, self._ee))
+        shared.close()
+
+    def _profile(self, elapsed):
+        self._busy += elapsed
+
+        if self._pending is None:
+            if self._busy >= self._compile_time:
+                self._compiler = ThreadPoolExecutor(1)
+                self._pending = self._compiler.submit(
+                    self._compile_background, self._ir, 3)
+        elif self._pending.done():
+            self.tier_up()
+
+    def tier_up(self):
+        if not self._tiering:
+            return
+        if self._pending is None:
+            self._load(self._compile(self._ir, 3))
+        else:
+            self._load(self._pending.result())
+            self._compiler.shutdown()
 
-    def set_pin_state(self, pin, value):
-        ptr = self._ee.get_global_value_address(self._get_source_path(pin))
-        cast(ptr, POINTER(c_ulonglong))[0] = value
+        for image in self._images.values():
+            self._bind_image(image)
+
+        self.tier = 3
+        self._tiering = False
+        self._compiler = None
+        self._pending = None
 
     def step(self):
-        self._step_func()
+        if self.shared is not None:
+            self.shared.begin()
+            self._step_func()
+            self.shared.end()
+        else:
+            self._step_func()
+
+        if self._tiering:
+            self._steps += 1
+            if self._steps & 4095 == 0:
+                now = perf_counter()
+                if self._steps > 4096:
+                    self._profile(now - self._last_profile)
+                self._last_profile = now
 
     def burst(self):
-        self._burst_func()
+        if self._burst_func is None:
+            self._burst_func = self._get_function('burst')
+
+        self._call(self._burst_func)
+
+    def _call(self, func, *args):
+        if self.shared is not None:
+            self.shared.begin()
+
+        if not self._tiering:
+            func(*args)
+        else:
+            a = perf_counter()
+            func(*args)
+            self._profile(perf_counter() - a)
+
+        if self.shared is not None:
+            self.shared.end()
+
+    def run(self, cycles):
+        if self._run_func is None:
+            self._run_func = self._get_function('run', c_uint64, c_void_p)
+        if self._run_shadow is None:
+            self._run_shadow = (c_char * (_fields_end(self.layout) - self._run_start))()
+
+        if self.shared is None:
+            self._call(self._run_func, cycles, self._run_shadow)
+            return
+
+        while cycles:
+            chunk = min(cycles, SHARED_RUN_CHUNK)
+            self._call(self._run_func, chunk, self._run_shadow)
+            cycles -= chunk
+
+    def _vector_table(self, inputs, outputs):
+        table = [len(inputs), len(outputs)]
+        for pin in list(inputs) + list(outputs):
+            offset, width = self._get_field(pin)
+            if width > 64:
+                raise ValueError(f'pin {pin} is wider than 64 bits')
+            table.extend((offset, _mask(width)))
+        return table
+
+    def run_vectors(self, stimulus, inputs, outputs, out=None):
+        import numpy as np
+
+        inputs = list(inputs)
+        outputs = list(outputs)
+        stimulus = np.ascontiguousarray(stimulus, np.uint64)
+        if stimulus.ndim != 2 or stimulus.shape[1] != len(inputs):
+            raise ValueError('stimulus must have one column per input pin')
+
+        cycles = stimulus.shape[0]
+        if out is None:
+            out = np.empty((cycles, len(outputs)), np.uint64)
+        elif (out.shape != (cycles, len(outputs)) or out.dtype != np.uint64
+              or not out.flags.c_contiguous):
+            raise ValueError('out must be a contiguous uint64 array of '
+                             'one row per cycle and one column per output')
+
+        table = np.array(self._vector_table(inputs, outputs), np.uint64)
+
+        if self._testbench_func is None:
+            self._testbench_func = self._get_function(
+                'testbench', c_void_p, c_void_p, c_uint64, c_void_p)
+
+        self._call(self._testbench_func, stimulus.ctypes.data, out.ctypes.data,
+                   cycles, table.ctypes.data)
+
+        return out
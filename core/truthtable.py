@@ -0,0 +1,244 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from ctypes import CFUNCTYPE, c_uint64, c_void_p
+from functools import reduce
+
+import llvmlite.ir as ll
+import numpy as np
+
+from .descriptors import Adder, Composite, Constant, Gate, Not
+from .netlist import Netlist
+from .optimizer import optimize
+from .simulator import _compile, _mask
+
+
+LANE_TYPE = ll.IntType(64)
+LANES = 64
+LANE_BITS = 6
+
+_ZERO = ll.Constant(LANE_TYPE, 0)
+_ONES = ll.Constant(LANE_TYPE, _mask(LANES))
+
+_GATE_OPS = {
+    Gate.AND: ll.IRBuilder.and_,
+    Gate.OR: ll.IRBuilder.or_,
+    Gate.XOR: ll.IRBuilder.xor
+}
+
+
+def _lane_pattern(bit):
+    return reduce(lambda acc, lane: acc | (lane >> bit & 1) << lane,
+                  range(LANES), 0)
+
+
+def _slice_constant(b: ll.IRBuilder, desc: Constant, planes):
+    return {'out': list(map(lambda i: _ONES if desc.value >> i & 1 else _ZERO,
+                            range(desc.width)))}
+
+
+def _slice_not(b: ll.IRBuilder, desc: Not, planes):
+    return {'out': list(map(b.not_, planes['in']))}
+
+
+def _slice_gate(b: ll.IRBuilder, desc: Gate, planes):
+    op = _GATE_OPS[desc.op]
+    inputs = map(lambda i: planes['in' + str(i)], range(desc.num_inputs))
+    out = map(lambda bits: reduce(lambda x, y: op(b, x, y), bits), zip(*inputs))
+    if desc.negated:
+        out = map(b.not_, out)
+    return {'out': list(out)}
+
+
+def _slice_adder(b: ll.IRBuilder, desc: Adder, planes):
+    carry = planes['cin'][0]
+    sum_ = list()
+    for x, y in zip(planes['a'], planes['b']):
+        half = b.xor(x, y)
+        sum_.append(b.xor(half, carry))
+        carry = b.or_(b.and_(x, y), b.and_(half, carry))
+    return {'sum': sum_, 'cout': [carry]}
+
+
+SLICED = {
+    Constant: _slice_constant,
+    Not: _slice_not,
+    Gate: _slice_gate,
+    Adder: _slice_adder
+}
+
+
+def emit_sliced(b: ll.IRBuilder, netlist: Netlist, nets, inject=None):
+    for net, value in netlist.constants.items():
+        nets[net] = list(map(lambda i: _ONES if value >> i & 1 else _ZERO,
+                             range(value.bit_length())))
+
+    produced = set()
+    for desc, path in netlist.cells:
+        produced.update(map(lambda p: p[0], netlist.iter_outputs(desc, path)))
+
+    def get_planes(net, width):
+        if net not in nets and net in produced:
+            raise ValueError(f'{net} is part of a combinational loop')
+        planes = nets.get(net, [])[:width]
+        return planes + [_ZERO] * (width - len(planes))
+
+    for desc, path in netlist.cells:
+        tp = type(desc)
+        if tp not in SLICED:
+            raise ValueError(f'{path} ({tp.__name__}) is not combinational')
+        planes = dict(map(lambda p: (p[0], get_planes(netlist.pin(path, p[0]), p[1])),
+                          desc.all_inputs()))
+        for pin, value in SLICED[tp](b, desc, planes).items():
+            net = netlist.pin(path, pin)
+            nets[net] = value if inject is None else inject(net, value)
+
+    return get_planes
+
+
+def _emit_table(mod: ll.Module, name, netlist: Netlist, inputs, outputs):
+    func_type = ll.FunctionType(
+        ll.VoidType(), (LANE_TYPE, LANE_TYPE, LANE_TYPE, LANE_TYPE.as_pointer()))
+
+    func = ll.Function(mod, func_type, name=name)
+    begin, end, words, out = func.args
+    out.add_attribute('noalias')
+    b_entry = func.append_basic_block()
+    b_loop = func.append_basic_block()
+    b_body = func.append_basic_block()
+    b_exit = func.append_basic_block()
+    b = ll.IRBuilder()
+
+    b.position_at_end(b_entry)
+    w_p = b.alloca(LANE_TYPE)
+    b.store(begin, w_p)
+    b.branch(b_loop)
+
+    b.position_at_end(b_loop)
+    w = b.load(w_p)
+    b.cbranch(b.icmp_unsigned('>=', w, end), b_exit, b_body)
+
+    b.position_at_end(b_body)
+    nets = dict()
+
+    bit = 0
+    for name, width in inputs:
+        planes = list()
+        for _ in range(width):
+            if bit < LANE_BITS:
+                planes.append(ll.Constant(LANE_TYPE, _lane_pattern(bit)))
+            else:
+                shifted = b.lshr(w, ll.Constant(LANE_TYPE, bit - LANE_BITS))
+                planes.append(b.neg(b.and_(shifted, ll.Constant(LANE_TYPE, 1))))
+            bit += 1
+        nets['/' + name + '/pin'] = planes
+
+    get_planes = emit_sliced(b, netlist, nets)
+
+    row = 0
+    for name, width in outputs:
+        for plane in get_planes(netlist.net('/' + name + '/pin'), width):
+            index = b.add(b.mul(ll.Constant(LANE_TYPE, row), words), w)
+            b.store(plane, b.gep(out, (index,), inbounds=True))
+            row += 1
+
+    b.store(b.add(w, ll.Constant(LANE_TYPE, 1)), w_p)
+    b.branch(b_loop)
+
+    b.position_at_end(b_exit)
+    b.ret_void()
+
+    return func
+
+
+class TruthTable:
+    def __init__(self, inputs, outputs, planes):
+        self.inputs = inputs
+        self.outputs = outputs
+        self.planes = planes
+        self.rows = 1 << sum(map(lambda p: p[1], inputs))
+
+    def __len__(self):
+        return self.rows
+
+    def _output_planes(self, name):
+        row = 0
+        for output, width in self.outputs:
+            if output == name:
+                return self.planes[row:row + width]
+            row += width
+        raise KeyError(name)
+
+    def _input_bits(self, name):
+        bit = 0
+        for input_, width in self.inputs:
+            if input_ == name:
+                return range(bit, bit + width)
+            bit += width
+        raise KeyError(name)
+
+    def column(self, name):
+        values = np.zeros(self.rows, np.uint64)
+        for i, plane in enumerate(self._output_planes(name)):
+            bits = np.unpackbits(plane.view(np.uint8), bitorder='little')
+            values |= bits[:self.rows].astype(np.uint64) << np.uint64(i)
+        return values
+
+    def array(self):
+        return np.stack(list(map(lambda p: self.column(p[0]), self.outputs)), 1)
+
+    def input_column(self, name):
+        bits = self._input_bits(name)
+        rows = np.arange(self.rows, dtype=np.uint64)
+        return rows >> np.uint64(bits.start) & np.uint64(_mask(len(bits)))
+
+    def _depends_on_bit(self, planes, bit):
+        if bit < LANE_BITS:
+            low = np.uint64(_mask(LANES) ^ _lane_pattern(bit))
+            shift = np.uint64(1 << bit)
+            return bool(np.any((planes ^ planes >> shift) & low))
+        step = 1 << bit - LANE_BITS
+        halves = planes.reshape(len(planes), -1, 2, step)
+        return bool(np.any(halves[:, :, 0] != halves[:, :, 1]))
+
+    def support(self, name):
+        planes = self._output_planes(name)
+        return list(map(lambda p: p[0], filter(
+            lambda p: any(map(lambda bit: self._depends_on_bit(planes, bit),
+                              self._input_bits(p[0]))),
+            self.inputs)))
+
+    def __str__(self):
+        lines = [f'{len(self.inputs)} inputs, {len(self.outputs)} outputs, '
+                 f'{self.rows} rows']
+        for name, width in self.outputs:
+            lines.append(f'  {name}[{width}] depends on '
+                         + ', '.join(self.support(name)))
+        return '\n'.join(lines)
+
+
+def truth_table(root: Composite, num_threads=None):
+    inputs = list(root.all_inputs())
+    outputs = list(root.all_outputs())
+
+    netlist = Netlist(root)
+    optimize(netlist, map(lambda p: '/' + p[0] + '/pin', outputs))
+
+    mod = ll.Module()
+    _emit_table(mod, 'table', netlist, inputs, outputs)
+    _, _, ee = _compile(mod)
+    table = CFUNCTYPE(None, c_uint64, c_uint64, c_uint64, c_void_p)(
+        ee.get_function_address('table'))
+
+    words = 1 << max(0, sum(map(lambda p: p[1], inputs)) - LANE_BITS)
+    planes = np.empty((sum(map(lambda p: p[1], outputs)), words), np.uint64)
+
+    if num_threads is None:
+        num_threads = os.cpu_count() or 1
+    chunks = min(words, num_threads * 4)
+    bounds = list(map(lambda i: words * i // chunks, range(chunks + 1)))
+
+    with ThreadPoolExecutor(num_threads) as pool:
+        list(pool.map(lambda i: table(bounds[i], bounds[i + 1], words,
+                                      planes.ctypes.data), range(chunks)))
+
+    return TruthTable(inputs, outputs, planes)
@@ -1,12 +1,11 @@
 from collections import defaultdict
 from copy import deepcopy
-from itertools import product
 from typing import List
 from PySide6.QtGui import QTransform
 
 import networkx as nx
 
-from PySide6.QtCore import QPoint, QRect
+from PySide6.QtCore import QLine, QPoint, QRect
 
 from core.descriptors import ExposedPin, Gate, Not, Composite
 
@@ -85,6 +84,51 @@ class Schematic:
         self.wires = nx.Graph()
         self.composite = Composite()
 
+    @property
+    def wires(self):
+        return self._wires
+
+    @wires.setter
+    def wires(self, wires):
+        self._wires = wires
+        self._wire_geometry = None
+
+    def wire_geometry(self):
+        if self._wire_geometry is not None:
+            return self._wire_geometry
+
+        horizontal = set()
+        vertical = set()
+        junctions = list()
+
+        for p1, p2 in self.wires.edges:
+            x1, y1, x2, y2 = p1.x(), p1.y(), p2.x(), p2.y()
+            if y1 == y2 and abs(x2 - x1) == 1:
+                horizontal.add((min(x1, x2), y1))
+            elif x1 == x2 and abs(y2 - y1) == 1:
+                vertical.add((x1, min(y1, y2)))
+
+        for p in self.wires.nodes:
+            x, y = p.x(), p.y()
+            if self.all_connected(p):
+                junctions.append(QPoint(p))
+            elif self.cross_connected(p):
+                horizontal.update(((x - 1, y), (x, y)))
+                vertical.update(((x, y - 1), (x, y)))
+
+        lines = list()
+        for edges, dx, dy in ((horizontal, 1, 0), (vertical, 0, 1)):
+            for x, y in edges:
+                if (x - dx, y - dy) in edges:
+                    continue
+                x2, y2 = x + dx, y + dy
+                while (x2, y2) in edges:
+                    x2, y2 = x2 + dx, y2 + dy
+                lines.append(QLine(x, y, x2, y2))
+
+        self._wire_geometry = lines, junctions
+        return self._wire_geometry
+
     def reconstruct(self):
         s = self.composite
         s.graph.clear()
@@ -111,10 +155,17 @@ class Schematic:
             for pos, pin_name in element.all_inputs():
                 _add_pin(dests, element.name, pin_name, pos)
 
-        for src, dest in product(sources, dests):
-            if not nx.has_path(self.wires, src[2], dest[2]):
-                continue
-            s.connect(*src[:2], *dest[:2])
+        components = dict()
+        for i, nodes in enumerate(nx.connected_components(self.wires)):
+            components.update(dict.fromkeys(nodes, i))
+
+        by_component = dict()
+        for dest in dests:
+            by_component.setdefault(components[dest[2]], list()).append(dest)
+
+        for src in sources:
+            for dest in by_component.get(components[src[2]], ()):
+                s.connect(*src[:2], *dest[:2])
 
         return s
 
@@ -162,6 +213,8 @@ class Schematic:
             p + DIRS[WEST], p + DIRS[EAST]) and self.wires.has_edge(p + DIRS[NORTH], p + DIRS[SOUTH])
 
     def overlap(self, p):
+        self._wire_geometry = None
+
         if self.all_connected(p):
             for d in DIRS:
                 self.wires.remove_edge(p, p + d)
@@ -76,6 +76,18 @@ def make_combo_box(desc, attribute, values, callback=None):
     return cb
 
 
+class _CopyOnWrite:
+    def __init__(self, element):
+        object.__setattr__(self, 'element', element)
+
+    def __getattr__(self, attribute):
+        return getattr(self.element.descriptor, attribute)
+
+    def __setattr__(self, attribute, value):
+        element = self.element
+        element.descriptor = element.descriptor.replace(**{attribute: value})
+
+
 class ElementPropertyEditor(QWidget):
     edited = Signal()
 
@@ -89,6 +101,7 @@ class ElementPropertyEditor(QWidget):
     def _make_widgets(self):
         element = self.element
         desc = element.descriptor
+        params = _CopyOnWrite(element)
         layout = self.layout()
 
         def emit_edited():
@@ -106,23 +119,23 @@ class ElementPropertyEditor(QWidget):
 
         if isinstance(desc, Not):
             layout.addRow('Width:', make_spin_box(
-                desc, 'width', 1, 64, callback=emit_edited))
+                params, 'width', 1, 64, callback=emit_edited))
         elif isinstance(desc, Gate):
             layout.addRow('Width:', make_spin_box(
-                desc, 'width', 1, 64, callback=emit_edited))
+                params, 'width', 1, 64, callback=emit_edited))
             layout.addRow('Inputs:', make_spin_box(
-                desc, 'num_inputs', 2, 64, callback=emit_edited))
+                params, 'num_inputs', 2, 64, callback=emit_edited))
             layout.addRow('Negated:', make_check_box(
-                desc, 'negated', callback=emit_edited))
-            layout.addRow('Logic:', make_combo_box(desc, 'op', {
+                params, 'negated', callback=emit_edited))
+            layout.addRow('Logic:', make_combo_box(params, 'op', {
                 'And': Gate.AND,
                 'Or': Gate.OR,
                 'Xor': Gate.XOR
             }, callback=emit_edited))
         elif isinstance(desc, ExposedPin):
             layout.addRow('Width:', make_spin_box(
-                desc, 'width', 1, 64, callback=emit_edited))
-            layout.addRow('Direction:', make_combo_box(desc, 'direction', {
+                params, 'width', 1, 64, callback=emit_edited))
+            layout.addRow('Direction:', make_combo_box(params, 'direction', {
                 'In': ExposedPin.IN,
                 'Out': ExposedPin.OUT,
             }, callback=emit_edited))
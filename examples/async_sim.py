@@ -0,0 +1,56 @@
+import asyncio
+from time import time
+from core.aio import AsyncExecutor
+from core.descriptors import Clock, Composite, Counter
+from core.simulator import JIT
+
+
+def build(short, long):
+    s = Composite()
+    clock = Clock()
+    clock.short = short
+    clock.long = long
+    s.add_child('clk', clock)
+    s.add_child('k', Counter(8))
+    s.connect('clk', 'out', 'k', 'clock')
+    return s
+
+
+async def watch(sim, name):
+    async for cycle, value in sim.watch('/k/out'):
+        if value % 64 == 0:
+            print(name, 'cycle', cycle, 'count', value)
+
+
+async def heartbeat():
+    beats = 0
+    while True:
+        await asyncio.sleep(0.01)
+        beats += 1
+        if beats % 50 == 0:
+            print('event loop alive', beats)
+
+
+async def main():
+    fast = AsyncExecutor(JIT(build(1, 1), 500, True), chunk_size=1000)
+    slow = AsyncExecutor(JIT(build(3, 5), 500, True), chunk_size=1000)
+
+    watchers = [asyncio.create_task(watch(fast, 'fast')),
+                asyncio.create_task(watch(slow, 'slow'))]
+    beat = asyncio.create_task(heartbeat())
+
+    a = time()
+    await asyncio.gather(
+        fast.run_for(2000000),
+        slow.until(lambda e: e.get_pin_state('/k/out') == 200))
+    b = time()
+
+    print('fast', fast.cycle, 'slow', slow.cycle, 'in', b - a)
+
+    for task in watchers + [beat]:
+        task.cancel()
+    fast.close()
+    slow.close()
+
+
+asyncio.run(main())
@@ -0,0 +1,36 @@
+from time import time
+from core.descriptors import Clock, Composite, Counter, ExposedPin, Not
+from core.simulator import JIT
+from core.netlist import iter_simulation_pins
+
+s = Composite()
+s.add_child('clk', Clock())
+s.add_child('k', Counter(8))
+s.connect('clk', 'out', 'k', 'clock')
+for i in range(2000):
+    s.add_child(f'i{i}', ExposedPin(ExposedPin.IN, 1))
+    s.add_child(f'n{i}', Not(1))
+    s.connect(f'i{i}', 'pin', f'n{i}', 'in')
+
+sim = JIT(s, 1, True)
+pins = list(map(lambda p: p[0], iter_simulation_pins(s)))
+
+N = 100
+token, _ = sim.changed_since()
+previous = dict(map(lambda pin: (pin, sim.get_pin_state(pin)), pins))
+
+a = time()
+for c in range(N):
+    sim.step()
+    current = dict(map(lambda pin: (pin, sim.get_pin_state(pin)), pins))
+    polled = set(filter(lambda pin: current[pin] != previous[pin], pins))
+    previous = current
+b = time()
+for c in range(N):
+    sim.step()
+    token, changed = sim.changed_since(token)
+c = time()
+
+print(sorted(polled))
+print(sorted(changed & set(pins)))
+print('polling', b - a, 'changed_since', c - b)
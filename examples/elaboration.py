@@ -0,0 +1,52 @@
+from time import time
+from core.descriptors import Composite, ExposedPin, Gate
+from core.netlist import (Netlist, elaboration_cache, iter_simulation_pins,
+                          iter_simulation_topology)
+
+ein = ExposedPin(ExposedPin.IN)
+eout = ExposedPin(ExposedPin.OUT)
+
+full_adder = Composite()
+for name in ('a', 'b', 'cin'):
+    full_adder.add_child(name, ein)
+for name in ('s', 'cout'):
+    full_adder.add_child(name, eout)
+full_adder.add_child('xor1', Gate(Gate.XOR))
+full_adder.add_child('xor2', Gate(Gate.XOR))
+full_adder.add_child('and1', Gate(Gate.AND))
+full_adder.add_child('and2', Gate(Gate.AND))
+full_adder.add_child('or1', Gate(Gate.OR))
+full_adder.connect('a', '', 'xor1', 'in0')
+full_adder.connect('b', '', 'xor1', 'in1')
+full_adder.connect('xor1', 'out', 'xor2', 'in0')
+full_adder.connect('cin', '', 'xor2', 'in1')
+full_adder.connect('xor2', 'out', 's', '')
+full_adder.connect('a', '', 'and2', 'in0')
+full_adder.connect('b', '', 'and2', 'in1')
+full_adder.connect('xor1', 'out', 'and1', 'in0')
+full_adder.connect('cin', '', 'and1', 'in1')
+full_adder.connect('and1', 'out', 'or1', 'in0')
+full_adder.connect('and2', 'out', 'or1', 'in1')
+full_adder.connect('or1', 'out', 'cout', '')
+
+adder = Composite()
+for i in range(32):
+    adder.add_child(f'fa{i}', full_adder)
+    if i > 0:
+        adder.connect(f'fa{i - 1}', 'cout', f'fa{i}', 'cin')
+
+main = Composite()
+for i in range(128):
+    main.add_child(f'adder{i}', adder)
+
+
+def elaborate():
+    a = time()
+    Netlist(main)
+    list(iter_simulation_pins(main))
+    list(iter_simulation_topology(main))
+    return time() - a
+
+
+print('cold', elaborate(), elaboration_cache)
+print('warm', elaborate(), elaboration_cache)
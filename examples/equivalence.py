@@ -0,0 +1,80 @@
+from time import time
+from core.descriptors import Adder, Composite, ExposedPin, Gate, Not
+from core.equivalence import check_equivalence
+
+ein = ExposedPin(ExposedPin.IN)
+eout = ExposedPin(ExposedPin.OUT)
+
+
+def full_adder(carry_op):
+    adder = Composite()
+    adder.add_child('a', ein)
+    adder.add_child('b', ein)
+    adder.add_child('cin', ein)
+    adder.add_child('s', eout)
+    adder.add_child('cout', eout)
+
+    adder.add_child('xor1', Gate(Gate.XOR))
+    adder.add_child('xor2', Gate(Gate.XOR))
+    adder.add_child('and1', Gate(Gate.AND))
+    adder.add_child('and2', Gate(carry_op))
+    adder.add_child('or1', Gate(Gate.OR))
+
+    adder.connect('a', 'pin', 'xor1', 'in0')
+    adder.connect('b', 'pin', 'xor1', 'in1')
+    adder.connect('xor1', 'out', 'xor2', 'in0')
+    adder.connect('cin', 'pin', 'xor2', 'in1')
+    adder.connect('xor2', 'out', 's', 'pin')
+    adder.connect('a', 'pin', 'and2', 'in0')
+    adder.connect('b', 'pin', 'and2', 'in1')
+    adder.connect('xor1', 'out', 'and1', 'in0')
+    adder.connect('cin', 'pin', 'and1', 'in1')
+    adder.connect('and1', 'out', 'or1', 'in0')
+    adder.connect('and2', 'out', 'or1', 'in1')
+    adder.connect('or1', 'out', 'cout', 'pin')
+    return adder
+
+
+reference = Composite()
+reference.add_child('x', ein)
+reference.add_child('y', ein)
+reference.add_child('c', ein)
+reference.add_child('sum', eout)
+reference.add_child('carry', eout)
+reference.add_child('add', Adder(1))
+reference.connect('x', 'pin', 'add', 'a')
+reference.connect('y', 'pin', 'add', 'b')
+reference.connect('c', 'pin', 'add', 'cin')
+reference.connect('add', 'sum', 'sum', 'pin')
+reference.connect('add', 'cout', 'carry', 'pin')
+
+pins = {'a': 'x', 'b': 'y', 'cin': 'c', 's': 'sum', 'cout': 'carry'}
+print(check_equivalence(full_adder(Gate.AND), reference, pins))
+print(check_equivalence(full_adder(Gate.OR), reference, pins))
+
+
+def wide_adder(double_negated):
+    s = Composite()
+    s.add_child('a', ExposedPin(ExposedPin.IN, 32))
+    s.add_child('b', ExposedPin(ExposedPin.IN, 32))
+    s.add_child('cin', ein)
+    s.add_child('sum', ExposedPin(ExposedPin.OUT, 32))
+    s.add_child('add', Adder(32))
+    s.connect('a', 'pin', 'add', 'a')
+    s.connect('cin', 'pin', 'add', 'cin')
+    s.connect('add', 'sum', 'sum', 'pin')
+    if double_negated:
+        s.add_child('n1', Not(32))
+        s.add_child('n2', Not(32))
+        s.connect('b', 'pin', 'n1', 'in')
+        s.connect('n1', 'out', 'n2', 'in')
+        s.connect('n2', 'out', 'add', 'b')
+    else:
+        s.connect('b', 'pin', 'add', 'b')
+    return s
+
+
+a = time()
+result = check_equivalence(wide_adder(False), wide_adder(True), vectors=1 << 24)
+b = time()
+print(result, 'in', b - a, 's')
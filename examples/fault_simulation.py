@@ -0,0 +1,65 @@
+from time import time
+import numpy as np
+from core.descriptors import Composite, ExposedPin, Gate, Not
+from core.faults import fault_simulate
+
+ein = ExposedPin(ExposedPin.IN)
+eout = ExposedPin(ExposedPin.OUT)
+
+adder = Composite()
+adder.add_child('a', ein)
+adder.add_child('b', ein)
+adder.add_child('cin', ein)
+adder.add_child('s', eout)
+adder.add_child('cout', eout)
+
+adder.add_child('xor1', Gate(Gate.XOR))
+adder.add_child('xor2', Gate(Gate.XOR))
+adder.add_child('and1', Gate(Gate.AND))
+adder.add_child('and2', Gate(Gate.AND))
+adder.add_child('or1', Gate(Gate.OR))
+
+adder.connect('a', 'pin', 'xor1', 'in0')
+adder.connect('b', 'pin', 'xor1', 'in1')
+adder.connect('xor1', 'out', 'xor2', 'in0')
+adder.connect('cin', 'pin', 'xor2', 'in1')
+adder.connect('xor2', 'out', 's', 'pin')
+adder.connect('a', 'pin', 'and2', 'in0')
+adder.connect('b', 'pin', 'and2', 'in1')
+adder.connect('xor1', 'out', 'and1', 'in0')
+adder.connect('cin', 'pin', 'and1', 'in1')
+adder.connect('and1', 'out', 'or1', 'in0')
+adder.connect('and2', 'out', 'or1', 'in1')
+adder.connect('or1', 'out', 'cout', 'pin')
+
+vectors = np.array([[0, 0, 0], [1, 1, 0], [1, 0, 1]])
+print(fault_simulate(adder, vectors))
+exhaustive = np.array(list(map(lambda r: [r & 1, r >> 1 & 1, r >> 2], range(8))))
+print(fault_simulate(adder, exhaustive))
+
+
+s = Composite()
+s.add_child('a', ExposedPin(ExposedPin.IN, 16))
+s.add_child('b', ExposedPin(ExposedPin.IN, 16))
+s.add_child('o', ExposedPin(ExposedPin.OUT, 16))
+
+prev, pin = 'a', 'pin'
+for i in range(40):
+    s.add_child(f'x{i}', Gate(Gate.XOR, 16))
+    s.add_child(f'n{i}', Not(16))
+    s.add_child(f'g{i}', Gate(Gate.XOR if i % 2 else Gate.OR, 16))
+    s.connect(prev, pin, f'x{i}', 'in0')
+    s.connect('b', 'pin', f'x{i}', 'in1')
+    s.connect(f'x{i}', 'out', f'n{i}', 'in')
+    s.connect(f'n{i}', 'out', f'g{i}', 'in0')
+    s.connect('a', 'pin', f'g{i}', 'in1')
+    prev, pin = f'g{i}', 'out'
+s.connect(prev, pin, 'o', 'pin')
+
+stimulus = np.random.randint(0, 1 << 16, (16384, 2))
+
+a = time()
+report = fault_simulate(s, stimulus)
+b = time()
+print(str(report).split('\n')[0])
+print(report.evaluations, 'fault x vector evaluations in', b - a, 's')
@@ -0,0 +1,25 @@
+from core.descriptors import Composite, Constant, Gate
+from core.simulator import JIT
+
+# t runs before n, so t reads the previous step's value of n.out even
+# though n.out is constant once n has run.
+s = Composite()
+s.add_child('n', Gate(Gate.OR, 1, 2))
+s.add_child('c', Constant(1, 1))
+s.add_child('t', Gate(Gate.XOR, 1, 2))
+s.connect('c', 'out', 'n', 'in0')
+s.connect('t', 'out', 'n', 'in1')
+s.connect('n', 'out', 't', 'in0')
+s.connect('t', 'out', 't', 'in1')
+
+traces = list()
+for map_pins in (True, False):
+    sim = JIT(s, 1, map_pins)
+    trace = list()
+    for _ in range(6):
+        sim.step()
+        trace.append(sim.get_pin_state('/t/out'))
+    traces.append(trace)
+
+print(*traces)
+assert traces[0] == traces[1] == [0, 1, 0, 1, 0, 1]
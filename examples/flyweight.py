@@ -0,0 +1,26 @@
+import tracemalloc
+from time import time
+
+from core.descriptors import Gate, flyweight
+
+N = 100000
+
+
+def place(make):
+    a = time()
+    elements = list(map(lambda i: make(), range(N)))
+    b = time()
+    del elements
+    tracemalloc.start()
+    elements = list(map(lambda i: make(), range(N)))
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, b - a, len(set(map(id, elements)))
+
+
+for name, make in (('fresh', lambda: Gate(Gate.AND, 8, 4)),
+                   ('flyweight', lambda: flyweight(Gate(Gate.AND, 8, 4))),
+                   ('replace', lambda: SHARED.replace(width=8))):
+    SHARED = flyweight(Gate(Gate.AND, 8, 4))
+    size, t, distinct = place(make)
+    print(name, size // N, 'bytes per element', distinct, 'distinct', t)
@@ -0,0 +1,40 @@
+import subprocess
+import sys
+
+MODULES = ('core.descriptors', 'core.netlist',
+           'core.simulator', 'serial', 'app')
+HEAVY = ('llvmlite.binding', 'PySide6', 'numpy', 'networkx')
+
+SCRIPT = '''
+import sys
+from time import time
+a = time()
+import {}
+b = time()
+print(b - a, *filter(lambda m: m in sys.modules, {!r}))
+'''
+
+FIRST_JIT = '''
+from time import time
+a = time()
+from core.descriptors import Composite, Not
+from core.simulator import JIT
+s = Composite()
+s.add_child('not', Not())
+s.connect('not', 'out', 'not', 'in')
+JIT(s, 1, True)
+b = time()
+print(b - a)
+'''
+
+
+def run(script):
+    return subprocess.run((sys.executable, '-c', script), capture_output=True,
+                          text=True, check=True).stdout.split()
+
+
+for module in MODULES:
+    t, *loaded = run(SCRIPT.format(module, HEAVY))
+    print(module, float(t), ' '.join(loaded))
+
+print('first JIT', float(run(FIRST_JIT)[0]))
@@ -0,0 +1,46 @@
+from time import time
+from core.descriptors import Clock, Composite, Counter
+from core.simulator import JIT
+
+s = Composite()
+
+fast = Clock()
+fast.short = 10
+fast.long = 30
+
+slow = Clock()
+slow.short = 500
+slow.long = 1500
+
+s.add_child('fast', fast)
+s.add_child('slow', slow)
+s.add_child('a', Counter(16))
+s.add_child('b', Counter(16))
+s.connect('fast', 'out', 'a', 'clock')
+s.connect('slow', 'out', 'b', 'clock')
+
+
+burst_size = 500
+sim = JIT(s, burst_size, True)
+
+N = 10000
+cycles = N * (burst_size + 1)
+
+a = time()
+for i in range(N):
+    sim.burst()
+b = time()
+A = b - a
+print('burst', sim.get_pin_state('/a/out'), sim.get_pin_state('/b/out'))
+
+sim.reset()
+
+a = time()
+sim.run(cycles)
+b = time()
+B = b - a
+print('run', sim.get_pin_state('/a/out'), sim.get_pin_state('/b/out'))
+
+print('burst', A / cycles)
+print('run', B / cycles)
+print(A / B)
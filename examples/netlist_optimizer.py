@@ -0,0 +1,60 @@
+from time import time
+from core.descriptors import Clock, Composite, Counter, ExposedPin, Gate, Not
+from core.netlist import Netlist
+from core.optimizer import optimize
+from core.simulator import JIT
+
+block = Composite()
+block.add_child('a', ExposedPin(ExposedPin.IN, 16))
+block.add_child('b', ExposedPin(ExposedPin.IN, 16))
+block.add_child('out', ExposedPin(ExposedPin.OUT, 16))
+
+prev = 'a'
+for i in range(8):
+    block.add_child(f'and{i}', Gate(Gate.AND, 16))
+    block.connect(prev, 'pin' if prev == 'a' else 'out', f'and{i}', 'in0')
+    block.connect('b', 'pin', f'and{i}', 'in1')
+    prev = f'and{i}'
+
+block.add_child('n1', Not(16))
+block.add_child('n2', Not(16))
+block.add_child('buf', Gate(Gate.OR, 16, 1))
+block.connect(prev, 'out', 'n1', 'in')
+block.connect('n1', 'out', 'n2', 'in')
+block.connect('n2', 'out', 'buf', 'in0')
+
+block.add_child('x1', Gate(Gate.XOR, 16))
+block.add_child('x2', Gate(Gate.XOR, 16))
+block.connect('a', 'pin', 'x1', 'in0')
+block.connect('b', 'pin', 'x1', 'in1')
+block.connect('b', 'pin', 'x2', 'in0')
+block.connect('a', 'pin', 'x2', 'in1')
+
+block.add_child('or', Gate(Gate.OR, 16, 3))
+block.connect('buf', 'out', 'or', 'in0')
+block.connect('x1', 'out', 'or', 'in1')
+block.connect('x2', 'out', 'or', 'in2')
+block.connect('or', 'out', 'out', 'pin')
+
+s = Composite()
+s.add_child('clk', Clock())
+s.add_child('k', Counter(16))
+s.connect('clk', 'out', 'k', 'clock')
+
+prev = 'k'
+for i in range(100):
+    s.add_child(f'b{i}', block)
+    s.connect(prev, 'out', f'b{i}', 'a')
+    s.connect('k', 'out', f'b{i}', 'b')
+    s.add_child(f'r{i}', Gate(Gate.XOR, 16))
+    s.connect(f'b{i}', 'out', f'r{i}', 'in0')
+    s.connect('k', 'out', f'r{i}', 'in1')
+    prev = f'r{i}'
+
+print(str(optimize(Netlist(s))).split('\n')[1])
+
+a = time()
+sim = JIT(s, 1000, True)
+b = time()
+print(str(sim.report).split('\n')[0])
+print('compiled in', b - a, 's')
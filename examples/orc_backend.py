@@ -0,0 +1,35 @@
+from time import time
+from core.descriptors import Clock, Composite, Counter, Gate, Not
+from core.simulator import JIT
+
+s = Composite()
+s.add_child('clk', Clock())
+s.add_child('k', Counter(16))
+s.connect('clk', 'out', 'k', 'clock')
+
+prev = 'k'
+for i in range(300):
+    s.add_child(f'x{i}', Gate(Gate.XOR, 16))
+    s.add_child(f'n{i}', Not(16))
+    s.connect(prev, 'out', f'x{i}', 'in0')
+    s.connect('k', 'out', f'x{i}', 'in1')
+    s.connect(f'x{i}', 'out', f'n{i}', 'in')
+    prev = f'n{i}'
+
+
+for backend in ('mcjit', 'orc'):
+    a = time()
+    sim = JIT(s, 1000, True, backend=backend)
+    sim.step()
+    b = time()
+    sim.burst()
+    c = time()
+    print(backend, 'first step', b - a, 'first burst', c - b)
+
+sim._ee.unload('burst')
+others = list(map(lambda i: JIT(s, 1000, True, backend='orc'), range(3)))
+for other in others:
+    other.burst()
+a = time()
+sim.burst()
+print('orc burst after unload', time() - a, sim.get_pin_state('/k/out'))
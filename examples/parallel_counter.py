@@ -0,0 +1,38 @@
+from time import time
+from core.descriptors import Clock, Composite, Counter
+from core.parallel import ParallelJIT
+from core.simulator import JIT
+
+
+def build(n):
+    s = Composite()
+    s.add_child('clk', Clock())
+    for i in range(n):
+        s.add_child(f'r{i}', Counter(16))
+        s.connect('clk', 'out', f'r{i}', 'clock')
+    return s
+
+
+burst_size = 10000
+N = 100
+counters = 1024
+
+sim = JIT(build(counters), burst_size, True)
+a = time()
+for i in range(N):
+    sim.burst()
+b = time()
+A = (b - a) / (N * burst_size)
+
+psim = ParallelJIT(build(counters), burst_size)
+a = time()
+for i in range(N):
+    psim.burst()
+b = time()
+B = (b - a) / (N * burst_size)
+psim.close()
+
+print('partitions', len(psim.partitions))
+print('single', A)
+print('parallel', B)
+print(A / B)
@@ -0,0 +1,45 @@
+from core.descriptors import Clock, Composite, Counter, ExposedPin, Not
+from core.parallel import ParallelJIT
+from core.simulator import JIT
+
+s = Composite()
+s.add_child('clk', Clock())
+s.add_child('k0', Counter(8))
+s.add_child('k1', Counter(8))
+s.connect('clk', 'out', 'k0', 'clock')
+s.connect('clk', 'out', 'k1', 'clock')
+s.add_child('i', ExposedPin(ExposedPin.IN, 1))
+s.add_child('n0', Not(1))
+s.add_child('n1', Not(1))
+s.connect('i', 'pin', 'n0', 'in')
+s.connect('n0', 'out', 'n1', 'in')
+
+pins = ['/k0/out', '/k1/out', '/n0/out', '/n1/out']
+stimulus = [0, 1, 1, 0, 1, 0, 0, 0, 1, 1] * 5
+
+
+def trace(sim):
+    rows = list()
+    for value in stimulus:
+        sim.set_pin_state('/i/pin', value)
+        sim.step()
+        rows.append(list(map(sim.get_pin_state, pins)))
+    return rows
+
+
+single = trace(JIT(s, 1, True))
+
+psim = ParallelJIT(s, 1, partitions=[['clk', 'k0', 'i', 'n0'], ['k1', 'n1']])
+split = trace(psim)
+psim.close()
+
+# nets produced in the same partition match JIT step for step, nets
+# crossing partitions reach their readers one step later
+assert list(map(lambda r: r[0], split)) == list(map(lambda r: r[0], single))
+assert list(map(lambda r: r[2], split)) == list(map(lambda r: r[2], single))
+for n in range(1, len(stimulus)):
+    assert split[n][1] == single[n - 1][1]
+    assert split[n][3] == 1 - split[n - 1][2]
+
+print('k1 single', list(map(lambda r: r[1], single[:10])))
+print('k1 split ', list(map(lambda r: r[1], split[:10])))
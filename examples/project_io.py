@@ -0,0 +1,69 @@
+import os
+import pickle
+from io import BytesIO
+from time import time
+
+from PySide6.QtCore import QPoint
+
+from core.descriptors import ExposedPin, Gate, Not
+from diagram import Element, Schematic
+import serial
+
+
+def build(num_diagrams, num_elements):
+    diagrams = list()
+    for i in range(num_diagrams):
+        d = Schematic(f'diagram_{i}')
+        for j in range(num_elements):
+            x, y = j % 64 * 8, j // 64 * 8
+            if j % 3 == 0:
+                desc = Gate(Gate.AND)
+            elif j % 3 == 1:
+                desc = Not()
+            else:
+                desc = ExposedPin(ExposedPin.IN)
+            d.elements.append(Element(f'e{j}', desc, QPoint(x, y)))
+        wires = list()
+        for j in range(num_elements):
+            x, y = j % 64 * 8, j // 64 * 8
+            wires.append((x, y + 2, x + 6, y + 2))
+            wires.append((x + 6, y + 2, x + 6, y + 6))
+        d.wires = d.construct_wires(wires)
+        if diagrams:
+            d.elements.append(
+                Element('sub', diagrams[-1].composite, QPoint(-10, -10)))
+        diagrams.append(d)
+    return diagrams
+
+
+N = 5
+diagrams = build(10, 500)
+
+for name, dump, load in (('pickle', pickle.dump, pickle.load),
+                         ('binary', lambda d, f: serial.save_project(f, d), serial.load_project)):
+    f = BytesIO()
+    a = time()
+    for i in range(N):
+        f.seek(0)
+        f.truncate()
+        dump(diagrams, f)
+    b = time()
+    for i in range(N):
+        f.seek(0)
+        load(f)
+    c = time()
+    print(name, 'size', len(f.getvalue()), 'save',
+          (b - a) / N, 'load', (c - b) / N)
+
+path = 'project_io.mcp'
+with open(path, 'wb') as f:
+    serial.save_project(f, diagrams)
+
+a = time()
+for i in range(N):
+    project = serial.open_project(path)
+    project.load(project.diagrams[0])
+    project.close()
+b = time()
+print('lazy open', (b - a) / N)
+os.remove(path)
@@ -121,8 +121,10 @@ for i in l:
     main.connect(a, 's', b, 'd')
 
 
+visible.add('/a1/cin/pin')
+
 burst_size = 1000
-sim = JIT(main, burst_size, True)
+sim = JIT(main, burst_size, True, observed=visible)
 sim.set_pin_state('/a1/cin/pin', 1)
 
 for j in range(10):
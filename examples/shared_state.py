@@ -0,0 +1,42 @@
+from multiprocessing import Process
+from time import sleep, time
+from core.descriptors import Clock, Composite, Counter
+from core.simulator import JIT
+from core.shared import StateViewer
+
+NAME = 'mcircuit-example'
+
+
+def view():
+    viewer = StateViewer(NAME)
+    for _ in range(5):
+        sleep(0.2)
+        viewer.refresh()
+        print('viewer: cycle', viewer.cycle, 'k1', viewer.get_pin_state('/k1/out'),
+              'k2', viewer.get_pin_state('/k2/out'),
+              'consistent' if viewer.consistent else 'torn')
+    viewer.close()
+
+
+if __name__ == '__main__':
+    s = Composite()
+    s.add_child('clk', Clock())
+    s.add_child('k1', Counter(32))
+    s.add_child('k2', Counter(32))
+    s.connect('clk', 'out', 'k1', 'clock')
+    s.connect('clk', 'out', 'k2', 'clock')
+
+    sim = JIT(s, 100000, True, shared=NAME)
+    viewer = Process(target=view)
+    viewer.start()
+
+    a = time()
+    n = 0
+    while viewer.is_alive():
+        sim.burst()
+        n += 1
+        sleep(0)
+    b = time()
+
+    print('simulator:', n, 'bursts in', b - a, 's')
+    sim.close()
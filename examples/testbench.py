@@ -0,0 +1,41 @@
+from time import time
+import numpy as np
+from core.descriptors import Adder, Composite, ExposedPin
+from core.simulator import JIT
+
+s = Composite()
+s.add_child('a', ExposedPin(ExposedPin.IN, 16))
+s.add_child('b', ExposedPin(ExposedPin.IN, 16))
+s.add_child('cin', ExposedPin(ExposedPin.IN, 1))
+s.add_child('add', Adder(16))
+s.connect('a', 'pin', 'add', 'a')
+s.connect('b', 'pin', 'add', 'b')
+s.connect('cin', 'pin', 'add', 'cin')
+
+inputs = ['/a/pin', '/b/pin', '/cin/pin']
+outputs = ['/add/sum', '/add/cout']
+
+N = 100000
+stimulus = np.random.randint(0, 1 << 16, (N, 3)).astype(np.uint64)
+stimulus[:, 2] &= 1
+
+sim = JIT(s, 1, True)
+
+a = time()
+expected = np.empty((N, 2), np.uint64)
+for c in range(N):
+    for i, pin in enumerate(inputs):
+        sim.set_pin_state(pin, int(stimulus[c, i]))
+    sim.step()
+    for i, pin in enumerate(outputs):
+        expected[c, i] = sim.get_pin_state(pin)
+b = time()
+result = sim.run_vectors(stimulus, inputs, outputs)
+c = time()
+
+total = stimulus[:, 0] + stimulus[:, 1] + stimulus[:, 2]
+assert (result == expected).all()
+assert (result[:, 0] == total & 0xffff).all()
+assert (result[:, 1] == total >> 16).all()
+
+print('python loop', b - a, 'run_vectors', c - b)
@@ -0,0 +1,34 @@
+from time import time
+from core.descriptors import Clock, Composite, Counter, Gate, Not
+from core.simulator import JIT
+
+s = Composite()
+s.add_child('clk', Clock())
+s.add_child('k', Counter(16))
+s.connect('clk', 'out', 'k', 'clock')
+
+prev = 'k'
+for i in range(300):
+    s.add_child(f'x{i}', Gate(Gate.XOR, 16))
+    s.add_child(f'n{i}', Not(16))
+    s.connect(prev, 'out', f'x{i}', 'in0')
+    s.connect('k', 'out', f'x{i}', 'in1')
+    s.connect(f'x{i}', 'out', f'n{i}', 'in')
+    prev = f'n{i}'
+
+
+burst_size = 1000
+T = 5
+
+for tiered in (False, True):
+    a = time()
+    sim = JIT(s, burst_size, True, tiered=tiered)
+    b = time()
+
+    n = 0
+    while time() - b < T:
+        sim.burst()
+        n += 1
+
+    print('tiered' if tiered else 'O3', 'first step after', b - a,
+          'cycles in', T, 's', n * (burst_size + 1), 'tier', sim.tier)
@@ -0,0 +1,56 @@
+from time import time
+from core.descriptors import Adder, Composite, ExposedPin, Gate
+from core.truthtable import truth_table
+
+ein = ExposedPin(ExposedPin.IN)
+eout = ExposedPin(ExposedPin.OUT)
+
+adder = Composite()
+adder.add_child('a', ein)
+adder.add_child('b', ein)
+adder.add_child('cin', ein)
+adder.add_child('s', eout)
+adder.add_child('cout', eout)
+
+adder.add_child('xor1', Gate(Gate.XOR))
+adder.add_child('xor2', Gate(Gate.XOR))
+adder.add_child('and1', Gate(Gate.AND))
+adder.add_child('and2', Gate(Gate.AND))
+adder.add_child('or1', Gate(Gate.OR))
+
+adder.connect('a', 'pin', 'xor1', 'in0')
+adder.connect('b', 'pin', 'xor1', 'in1')
+adder.connect('xor1', 'out', 'xor2', 'in0')
+adder.connect('cin', 'pin', 'xor2', 'in1')
+adder.connect('xor2', 'out', 's', 'pin')
+adder.connect('a', 'pin', 'and2', 'in0')
+adder.connect('b', 'pin', 'and2', 'in1')
+adder.connect('xor1', 'out', 'and1', 'in0')
+adder.connect('cin', 'pin', 'and1', 'in1')
+adder.connect('and1', 'out', 'or1', 'in0')
+adder.connect('and2', 'out', 'or1', 'in1')
+adder.connect('or1', 'out', 'cout', 'pin')
+
+table = truth_table(adder)
+print(table)
+print('a b cin | s cout')
+for row, (s, cout) in enumerate(table.array()):
+    print(row & 1, row >> 1 & 1, row >> 2, '|', s, cout)
+
+
+wide = Composite()
+wide.add_child('a', ExposedPin(ExposedPin.IN, 12))
+wide.add_child('b', ExposedPin(ExposedPin.IN, 12))
+wide.add_child('add', Adder(12))
+wide.add_child('sum', ExposedPin(ExposedPin.OUT, 12))
+wide.add_child('cout', ExposedPin(ExposedPin.OUT))
+wide.connect('a', 'pin', 'add', 'a')
+wide.connect('b', 'pin', 'add', 'b')
+wide.connect('add', 'sum', 'sum', 'pin')
+wide.connect('add', 'cout', 'cout', 'pin')
+
+a = time()
+table = truth_table(wide)
+b = time()
+print(table)
+print(len(table), 'rows in', b - a, 's')
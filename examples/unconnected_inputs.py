@@ -0,0 +1,65 @@
+from core.descriptors import Clock, Composite, Constant, Counter, ExposedPin, Gate
+from core.simulator import JIT
+
+# The constant on in0 folds away, but in1 is left unconnected and must
+# keep its own slot.
+s = Composite()
+s.add_child('k', Constant(1, 0))
+s.add_child('a', ExposedPin(ExposedPin.IN))
+s.add_child('g', Gate(Gate.XOR, 1, 3))
+s.add_child('o', ExposedPin(ExposedPin.OUT))
+s.connect('k', 'out', 'g', 'in0')
+s.connect('a', 'pin', 'g', 'in2')
+s.connect('g', 'out', 'o', 'pin')
+
+sim = JIT(s, 1, True)
+sim.set_pin_state('/a/pin', 1)
+sim.step()
+print(sim.report.simplified, sim.get_pin_state('/o/pin'))
+assert sim.get_pin_state('/o/pin') == 1
+
+# Folding c1 must not change what its input pins read.
+s = Composite()
+s.add_child('k', Constant(1, 0))
+s.add_child('clk', Clock())
+s.add_child('c13', Counter(1))
+s.add_child('c1', Gate(Gate.OR, 1, 3))
+s.connect('clk', 'out', 'c13', 'clock')
+s.connect('k', 'out', 'c1', 'in0')
+s.connect('c13', 'out', 'c1', 'in1')
+s.connect('clk', 'out', 'c1', 'in2')
+
+pins = ('/c1/in0', '/c1/in1', '/c1/in2', '/c1/out')
+traces = list()
+for map_pins in (True, False):
+    sim = JIT(s, 1, map_pins)
+    trace = list()
+    for _ in range(8):
+        sim.step()
+        trace.append(tuple(map(sim.get_pin_state, pins)))
+    traces.append(trace)
+
+print(*traces)
+assert traces[0] == traces[1]
+
+# h merges into g, which has an unconnected in1. Merging must not move
+# g's own pins onto h's inputs.
+s = Composite()
+s.add_child('a', ExposedPin(ExposedPin.IN))
+s.add_child('b', ExposedPin(ExposedPin.IN))
+s.add_child('h', Gate(Gate.AND))
+s.add_child('g', Gate(Gate.AND))
+s.add_child('o', ExposedPin(ExposedPin.OUT))
+s.connect('a', 'pin', 'h', 'in0')
+s.connect('b', 'pin', 'h', 'in1')
+s.connect('h', 'out', 'g', 'in0')
+s.connect('g', 'out', 'o', 'pin')
+
+sim = JIT(s, 1, True, observed=['/o/pin', '/a/pin', '/b/pin'])
+sim.set_pin_state('/a/pin', 1)
+sim.set_pin_state('/b/pin', 1)
+sim.set_pin_state('/g/in1', 1)
+sim.step()
+print(sim.report.merged, sim.get_pin_state('/o/pin'), sim.get_pin_state('/g/in0'))
+assert sim.report.merged == ['/g/']
+assert sim.get_pin_state('/o/pin') == 1
@@ -1,104 +1,372 @@
-from diagram import Schematic, Element
-import json
+import gc
+import mmap
+import struct
+from itertools import accumulate, chain
+
 from bidict import bidict
+from PySide6.QtCore import QPoint
 
-from version import VERSION
+from diagram import Schematic, Element
 
-from core.descriptors import ExposedPin, Gate, Not, Composite
+from core.descriptors import (RAM, ROM, Adder, Clock, Constant, Counter,
+                              ExposedPin, Gate, Not, Register, Composite,
+                              flyweight)
 
 
-_DESC_TO_NAME = bidict({
-    Not: 'not',
-    Gate: 'gate',
-    Composite: 'schematic',
-    ExposedPin: 'exposed_pin'
-})
+MAGIC = b'MCIR'
+FORMAT_VERSION = 3
 
-_OP_TO_NAME = bidict({
-    Gate.AND: 'and',
-    Gate.OR: 'or',
-    Gate.XOR: 'xor'
+_HEADER = struct.Struct('<4sH')
+_COUNT = struct.Struct('<I')
+_DIAGRAM = struct.Struct('<IIII')
+_ELEMENT = struct.Struct('<IBBii')
+_INDEX = struct.Struct('<III')
+_CONSTANT = struct.Struct('<HH')
+
+_DESC_TO_CODE = bidict({
+    ExposedPin: 0,
+    Constant: 1,
+    Not: 2,
+    Gate: 3,
+    Register: 4,
+    Counter: 5,
+    Clock: 6,
+    Adder: 7,
+    Composite: 8,
+    RAM: 9,
+    ROM: 10
 })
 
+_PARAMS = {
+    ExposedPin: (struct.Struct('<BH'), ('direction', 'width')),
+    Not: (struct.Struct('<H'), ('width',)),
+    Gate: (struct.Struct('<BHH?'), ('op', 'width', 'num_inputs', 'negated')),
+    Register: (struct.Struct('<H'), ('width',)),
+    Counter: (struct.Struct('<H'), ('width',)),
+    Clock: (struct.Struct('<QQ'), ('short', 'long')),
+    Adder: (struct.Struct('<H'), ('width',)),
+    RAM: (struct.Struct('<HH'), ('address_width', 'data_width')),
+    ROM: (struct.Struct('<HH'), ('address_width', 'data_width'))
+}
 
-def _desc_to_dict(desc):
-    d = dict()
+_LEGACY_CONSTANT = struct.Struct('<HQ')
 
-    d['type'] = _DESC_TO_NAME[type(desc)]
+_REFERENCE = struct.Struct('<I')
 
-    if isinstance(desc, Not):
-        d['width'] = desc.width
-    elif isinstance(desc, Gate):
-        d['num_inputs'] = desc.num_inputs
-        d['width'] = desc.width
-        d['negated'] = desc.negated
-        d['op'] = _OP_TO_NAME[desc.op]
-    elif isinstance(desc, Composite):
-        d['children'] = dict(map(lambda t: (
-            t[0], _desc_to_dict(t[1])), desc.children.items()))
-        d['connections'] = list(map(list, desc.connections))
-    elif isinstance(desc, ExposedPin):
-        d['width'] = desc.width
-        d['direction'] = 'in' if desc.direction == ExposedPin.IN else 'out'
 
-    return d
+class _Strings:
+    def __init__(self):
+        self.index = dict()
 
+    def intern(self, s):
+        if s not in self.index:
+            self.index[s] = len(self.index)
+        return self.index[s]
 
-def _dict_to_desc(d):
-    type = _DESC_TO_NAME.inverse[d['type']]
+    def pack(self):
+        blobs = list(map(lambda s: s.encode('utf-8'), self.index))
+        offsets = (0,) + tuple(accumulate(map(len, blobs)))
+        return (_COUNT.pack(len(blobs)) + struct.pack(f'<{len(offsets)}I', *offsets)
+                + b''.join(blobs))
 
-    if type is Not:
-        return Not(d['width'])
-    elif type is Gate:
-        return Gate(_OP_TO_NAME.inverse[d['op']], d['width'], d['num_inputs'], d['negated'])
-    elif type is Composite:
-        s = Composite()
-        for name, child in d['children'].items():
-            s.add_child(name, _dict_to_desc(child))
-        for conn in d['connections']:
-            s.connect(*conn)
-        return s
-    elif type is ExposedPin:
-        return ExposedPin(ExposedPin.IN if d['direction'] == 'in' else ExposedPin.OUT, d['width'])
 
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
 
-def _dict_to_element(d):
-    name = d['name']
-    descriptor = _dict_to_desc(d['descriptor'])
-    position = tuple(d['position'])
-    facing = d['facing']
+    def read(self, s: struct.Struct):
+        v = s.unpack_from(self.data, self.offset)
+        self.offset += s.size
+        return v
 
-    return Element(name, descriptor, qAddPostRoutine, facing)
+    def read_array(self, fmt, n):
+        s = struct.Struct(f'<{n}{fmt}')
+        return self.read(s)
 
 
-def _element_to_dict(element: Element):
-    d = dict()
+def _wire_segments(wires):
+    degree = dict()
+    horizontal = set()
+    vertical = set()
+    jumpers = list()
 
-    d['name'] = element.name
-    d['descriptor'] = _desc_to_dict(element.descriptor)
-    d['position'] = list(element.position)
-    d['facing'] = element.facing
+    for p, neighbors in wires.adj.items():
+        degree[p.x(), p.y()] = len(neighbors)
 
-    return d
+    for p1, p2 in wires.edges:
+        x1, y1, x2, y2 = p1.x(), p1.y(), p2.x(), p2.y()
+        dx, dy = abs(x2 - x1), abs(y2 - y1)
+        if dx == 1 and dy == 0:
+            horizontal.add((min(x1, x2), y1))
+        elif dx == 0 and dy == 1:
+            vertical.add((x1, min(y1, y2)))
+        else:
+            jumpers.append((x1, y1, x2, y2))
 
+    segments = list()
 
-def load_project(obj):
-    d = json.load(obj)
+    for edges, dx, dy in ((horizontal, 1, 0), (vertical, 0, 1)):
+        def interior(x, y):
+            return ((x - dx, y - dy) in edges and (x, y) in edges
+                    and degree[x, y] == 2)
 
-    # version = d['version']
-    root = _dict_to_desc(d['root'])
+        for x, y in edges:
+            if interior(x, y):
+                continue
+            x2, y2 = x + dx, y + dy
+            while interior(x2, y2):
+                x2, y2 = x2 + dx, y2 + dy
+            segments.append((x, y, x2, y2))
 
-    return root
+    nodes = list(filter(lambda p: degree[p] == 0, degree))
 
+    return segments, jumpers, nodes
 
-def save_project(obj, diagrams):
-    d = dict()
 
-    d['version'] = VERSION
-    dlist = d['diagrams'] = list()
+def _pack_element(element: Element, strings: _Strings, composites):
+    desc = element.descriptor
+    tp = type(desc)
+    p = element.position
+
+    data = _ELEMENT.pack(strings.intern(element.name), _DESC_TO_CODE[tp],
+                         element.facing, p.x(), p.y())
+
+    if tp is Composite:
+        if id(desc) not in composites:
+            raise ValueError(
+                f'element {element.name} refers to an unknown diagram')
+        return data + _REFERENCE.pack(composites[id(desc)])
+
+    if tp is Constant:
+        if desc.value < 0:
+            raise ValueError(
+                f'constant {element.name} has negative value {desc.value}')
+        value = desc.value.to_bytes((desc.value.bit_length() + 7) // 8,
+                                    'little')
+        return data + _CONSTANT.pack(desc.width, len(value)) + value
+
+    params, attributes = _PARAMS[tp]
+    return data + params.pack(*map(lambda a: getattr(desc, a), attributes))
+
+
+def _unpack_element(reader: _Reader, project):
+    name, code, facing, x, y = reader.read(_ELEMENT)
+    tp = _DESC_TO_CODE.inverse[code]
+
+    if tp is Composite:
+        index, = reader.read(_REFERENCE)
+        diagram = project.diagrams[index]
+        project.load(diagram)
+        desc = diagram.composite
+    elif tp is Constant:
+        if project.version < 3:
+            width, value = reader.read(_LEGACY_CONSTANT)
+        else:
+            width, length = reader.read(_CONSTANT)
+            value = int.from_bytes(
+                reader.data[reader.offset:reader.offset + length], 'little')
+            reader.offset += length
+        desc = flyweight(Constant(width, value))
+    else:
+        params, attributes = _PARAMS[tp]
+        desc = tp.__new__(tp)
+        for attribute, value in zip(attributes, reader.read(params)):
+            setattr(desc, attribute, value)
+        desc = flyweight(desc)
+
+    return Element(project.string(name), desc, QPoint(x, y), facing)
+
+
+def _pack_diagram(diagram: Schematic, strings: _Strings, composites):
+    segments, jumpers, nodes = _wire_segments(diagram.wires)
+
+    body = [_DIAGRAM.pack(len(diagram.elements), len(segments),
+                          len(jumpers), len(nodes))]
+    for element in diagram.elements:
+        body.append(_pack_element(element, strings, composites))
+    for array, n in ((segments, 4), (jumpers, 4), (nodes, 2)):
+        body.append(struct.pack(
+            f'<{len(array) * n}i', *chain.from_iterable(array)))
+
+    return b''.join(body)
+
+
+def dump_project(diagrams):
+    strings = _Strings()
+    composites = dict(map(lambda t: (id(t[1].composite), t[0]),
+                          enumerate(diagrams)))
+
+    names = list(map(lambda d: strings.intern(d.name), diagrams))
+    bodies = list(map(lambda d: _pack_diagram(
+        d, strings, composites), diagrams))
+
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION) + strings.pack()
+    offset = len(header) + _COUNT.size + _INDEX.size * len(diagrams)
+
+    index = [_COUNT.pack(len(diagrams))]
+    for name, body in zip(names, bodies):
+        index.append(_INDEX.pack(name, offset, len(body)))
+        offset += len(body)
+
+    return header + b''.join(index) + b''.join(bodies)
+
+
+class Project:
+    def __init__(self, data):
+        self.data = data
+        reader = _Reader(data)
+
+        magic, version = reader.read(_HEADER)
+        if magic != MAGIC:
+            raise ValueError('not a mcircuit project')
+        if version > FORMAT_VERSION:
+            raise ValueError(f'unsupported project format version {version}')
+        self.version = version
+
+        num_strings, = reader.read(_COUNT)
+
+        if version == 1:
+            lengths = reader.read_array('I', num_strings)
+            self._string_offsets = (0,) + tuple(accumulate(lengths))
+            self._string_base = reader.offset
+            reader.offset += self._string_offsets[-1]
+
+            num_diagrams, = reader.read(_COUNT)
+            names = reader.read_array('I', num_diagrams)
+            self._offsets = list()
+            for _ in names:
+                self._offsets.append(reader.offset)
+                _skip_diagram(reader)
+        else:
+            self._string_offsets = _StringOffsets(reader, num_strings)
+            self._string_base = reader.offset
+            reader.offset += self._string_offsets[num_strings]
+
+            num_diagrams, = reader.read(_COUNT)
+            names = list()
+            self._offsets = list()
+            for _ in range(num_diagrams):
+                name, offset, _ = reader.read(_INDEX)
+                names.append(name)
+                self._offsets.append(offset)
 
-    for diagram in diagrams:
-        d['schematic'] = _desc_to_dict()
-        d['connections'] = pass
+        self.diagrams = list(
+            map(lambda n: Schematic(self.string(n)), names))
+        self._index = dict(map(lambda t: (id(t[1]), t[0]),
+                               enumerate(self.diagrams)))
+        self._loaded = set()
 
-    json.dump(d, obj, indent=4)
+    def string(self, index):
+        start = self._string_base + self._string_offsets[index]
+        end = self._string_base + self._string_offsets[index + 1]
+        return str(self.data[start:end], 'utf-8')
+
+    def is_loaded(self, diagram):
+        return id(diagram) in self._loaded or id(diagram) not in self._index
+
+    def load(self, diagram):
+        if self.is_loaded(diagram):
+            return diagram
+        self._loaded.add(id(diagram))
+
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            reader = _Reader(self.data)
+            reader.offset = self._offsets[self._index[id(diagram)]]
+            _read_diagram(reader, diagram, self)
+            diagram.reconstruct()
+        finally:
+            if enabled:
+                gc.enable()
+
+        return diagram
+
+    def load_all(self):
+        for diagram in self.diagrams:
+            self.load(diagram)
+        return self.diagrams
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+class _StringOffsets:
+    def __init__(self, reader: _Reader, num_strings):
+        self.data = reader.data
+        self.offset = reader.offset
+        reader.offset += _COUNT.size * (num_strings + 1)
+
+    def __getitem__(self, index):
+        return _COUNT.unpack_from(self.data, self.offset + index * _COUNT.size)[0]
+
+
+def _skip_diagram(reader: _Reader):
+    num_elements, num_segments, num_jumpers, num_nodes = reader.read(_DIAGRAM)
+    for _ in range(num_elements):
+        _, code, _, _, _ = reader.read(_ELEMENT)
+        tp = _DESC_TO_CODE.inverse[code]
+        if tp is Composite:
+            reader.offset += _REFERENCE.size
+        elif tp is Constant:
+            reader.offset += _LEGACY_CONSTANT.size
+        else:
+            reader.offset += _PARAMS[tp][0].size
+    reader.offset += (num_segments * 4 + num_jumpers *
+                      4 + num_nodes * 2) * _COUNT.size
+
+
+def _read_diagram(reader: _Reader, diagram: Schematic, project: Project):
+    num_elements, num_segments, num_jumpers, num_nodes = reader.read(_DIAGRAM)
+
+    for _ in range(num_elements):
+        diagram.elements.append(_unpack_element(reader, project))
+
+    segments = reader.read_array('i', num_segments * 4)
+    jumpers = reader.read_array('i', num_jumpers * 4)
+    nodes = reader.read_array('i', num_nodes * 2)
+
+    points = dict()
+
+    def point(x, y):
+        p = points.get((x, y))
+        if p is None:
+            p = points[x, y] = QPoint(x, y)
+        return p
+
+    edges = list()
+
+    for i in range(0, len(segments), 4):
+        x1, y1, x2, y2 = segments[i:i + 4]
+        dx, dy = (x1 < x2), (y1 < y2)
+        path = list(map(lambda j: point(x1 + j * dx, y1 + j * dy),
+                        range(max(x2 - x1, y2 - y1) + 1)))
+        edges.extend(zip(path, path[1:]))
+
+    for i in range(0, len(jumpers), 4):
+        x1, y1, x2, y2 = jumpers[i:i + 4]
+        edges.append((point(x1, y1), point(x2, y2)))
+
+    diagram.wires.add_edges_from(edges)
+    diagram.wires.add_nodes_from(
+        map(lambda i: point(*nodes[i:i + 2]), range(0, len(nodes), 2)))
+
+
+def parse_project(data):
+    return Project(data).load_all()
+
+
+def open_project(path):
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return Project(data)
+
+
+def load_project(obj):
+    return parse_project(obj.read())
+
+
+def save_project(obj, diagrams):
+    obj.write(dump_project(diagrams))